@@ -6,6 +6,8 @@ Cria arquivos markdown com a estrutura e descrições dos diretórios.
 
 import os
 import json
+import stat
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Tuple
@@ -15,6 +17,11 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 ARCHITECTURE_DIR = PROJECT_ROOT / "architecture"
 IGNORE_DIRS = {'.git', '__pycache__', 'node_modules', '.pytest_cache', '.venv', 'venv', '.env'}
 IGNORE_FILES = {'.pyc', '.pyo', '.pyd', '.so', '.egg', '.egg-info', '.DS_Store'}
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Templates das linhas da tabela detalhada
+DIR_ROW = "| `%s/` | 📁 Dir | %s |"
+FILE_ROW = "| `%s` | %s | %s |"
 
 # Descrições conhecidas dos diretórios principais
 KNOWN_DESCRIPTIONS = {
@@ -92,43 +99,73 @@ def should_ignore(path: Path) -> bool:
     
     return False
 
+def _is_ignored_file(name: str, dir_fd: int) -> bool:
+    """Versão de should_ignore para arquivos, resolvida relativa a um fd de diretório."""
+    try:
+        if not stat.S_ISREG(os.stat(name, dir_fd=dir_fd).st_mode):
+            return False
+    except OSError:
+        return False
+    return any(name.endswith(ext) for ext in IGNORE_FILES)
+
+def walk_directory(directory: Path):
+    """
+    Percorre o diretório recursivamente, já removendo itens ignorados.
+    Usa os.fwalk quando disponível (syscalls *at relativas ao fd do diretório)
+    e cai para os.walk em plataformas sem suporte (ex: Windows).
+    """
+    if hasattr(os, 'fwalk'):
+        for root, dirs, files, rootfd in os.fwalk(str(directory)):
+            dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
+            yield Path(root), dirs, [f for f in files if not _is_ignored_file(f, rootfd)]
+    else:
+        for root, dirs, files in os.walk(directory):
+            root_path = Path(root)
+            dirs[:] = [d for d in dirs if not should_ignore(root_path / d)]
+            yield root_path, dirs, [f for f in files if not should_ignore(root_path / f)]
+
 def get_tree_structure(directory: Path, prefix: str = "", is_last: bool = True) -> List[str]:
-    """Gera estrutura em árvore estilo 'tree' command."""
+    """Gera estrutura em árvore estilo 'tree' command (DFS iterativa, sem recursão)."""
     lines = []
     
     if not directory.exists():
         return lines
     
-    # Conectores da árvore
-    connector = "└── " if is_last else "├── "
+    append = lines.append
     
-    # Adiciona o diretório atual
-    if prefix == "":  # Raiz
-        lines.append(f"{directory.name}/")
-    else:
-        lines.append(f"{prefix}{connector}{directory.name}/")
-    
-    # Prepara o prefixo para os filhos
-    if prefix == "":
-        child_prefix = ""
-    else:
-        child_prefix = prefix + ("    " if is_last else "│   ")
+    # Pilha explícita de (caminho, prefixo, é_último, é_diretório)
+    stack = [(directory, prefix, is_last, True)]
     
-    # Lista e ordena conteúdo
-    try:
-        items = sorted(directory.iterdir(), key=lambda x: (not x.is_dir(), x.name.lower()))
-        items = [item for item in items if not should_ignore(item)]
+    while stack:
+        path, prefix, is_last, is_dir = stack.pop()
         
-        for i, item in enumerate(items):
-            is_last_item = i == len(items) - 1
-            
-            if item.is_dir():
-                lines.extend(get_tree_structure(item, child_prefix, is_last_item))
-            else:
-                connector = "└── " if is_last_item else "├── "
-                lines.append(f"{child_prefix}{connector}{item.name}")
-    except PermissionError:
-        pass
+        # Conectores da árvore
+        connector = "└── " if is_last else "├── "
+        
+        if not is_dir:
+            append(f"{prefix}{connector}{path.name}")
+            continue
+        
+        # Adiciona o diretório atual e prepara o prefixo para os filhos
+        if prefix == "":  # Raiz
+            append(f"{path.name}/")
+            child_prefix = ""
+        else:
+            append(f"{prefix}{connector}{path.name}/")
+            child_prefix = prefix + ("    " if is_last else "│   ")
+        
+        # Lista e ordena conteúdo
+        try:
+            items = sorted(path.iterdir(), key=lambda x: (not x.is_dir(), x.name.lower()))
+            items = [item for item in items if not should_ignore(item)]
+        except PermissionError:
+            continue
+        
+        # Empilha em ordem reversa para que o primeiro item seja processado primeiro
+        last_index = len(items) - 1
+        for i in range(last_index, -1, -1):
+            item = items[i]
+            stack.append((item, child_prefix, i == last_index, item.is_dir()))
     
     return lines
 
@@ -167,6 +204,23 @@ def get_file_description(file_path: Path, base_path: Path) -> str:
     
     return "Arquivo do projeto"
 
+def write_document(output_file: Path, lines: List[str]):
+    """
+    Salva o documento de forma atômica: escreve tudo de uma vez em um arquivo
+    temporário com buffer grande e o move para o destino com os.replace, evitando
+    que leitores vejam um arquivo parcialmente escrito.
+    """
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    
+    try:
+        with open(tmp_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write('\n'.join(lines))
+        os.replace(tmp_file, output_file)
+    except OSError:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
 def generate_directory_documentation(directory: Path, output_file: Path, detailed: bool = False):
     """Gera documentação para um diretório específico."""
     lines = []
@@ -199,27 +253,21 @@ def generate_directory_documentation(directory: Path, output_file: Path, detaile
         lines.append("|-------------------|------|-----------|")
         
         # Coleta todos os arquivos recursivamente
-        for root, dirs, files in os.walk(directory):
-            root_path = Path(root)
-            
-            # Remove diretórios ignorados
-            dirs[:] = [d for d in dirs if not should_ignore(root_path / d)]
-            
+        for root_path, dirs, files in walk_directory(directory):
             # Processa diretórios
             for dir_name in sorted(dirs):
                 dir_path = root_path / dir_name
                 relative = dir_path.relative_to(directory)
                 desc = KNOWN_DESCRIPTIONS.get(str(dir_path.relative_to(PROJECT_ROOT)), "Diretório do projeto")
-                lines.append(f"| `{relative}/` | 📁 Dir | {desc} |")
+                lines.append(DIR_ROW % (relative, desc))
             
             # Processa arquivos
             for file_name in sorted(files):
                 file_path = root_path / file_name
-                if not should_ignore(file_path):
-                    relative = file_path.relative_to(directory)
-                    desc = get_file_description(file_path, directory)
-                    icon = "📄" if file_name.endswith('.py') else "📋"
-                    lines.append(f"| `{relative}` | {icon} | {desc} |")
+                relative = file_path.relative_to(directory)
+                desc = get_file_description(file_path, directory)
+                icon = "📄" if file_name.endswith('.py') else "📋"
+                lines.append(FILE_ROW % (relative, icon, desc))
         
         lines.append("")
     
@@ -229,34 +277,28 @@ def generate_directory_documentation(directory: Path, output_file: Path, detaile
     # Conta arquivos e diretórios
     total_files = 0
     total_dirs = 0
-    file_types = {}
+    file_types = Counter()
     
-    for root, dirs, files in os.walk(directory):
-        root_path = Path(root)
-        dirs[:] = [d for d in dirs if not should_ignore(root_path / d)]
-        
+    for root_path, dirs, files in walk_directory(directory):
         total_dirs += len(dirs)
         
         for file in files:
-            if not should_ignore(root_path / file):
-                total_files += 1
-                ext = Path(file).suffix.lower()
-                file_types[ext] = file_types.get(ext, 0) + 1
+            total_files += 1
+            ext = Path(file).suffix.lower()
+            file_types[ext] += 1
     
     lines.append(f"- **Total de arquivos**: {total_files}")
     lines.append(f"- **Total de diretórios**: {total_dirs}")
     lines.append(f"- **Tipos de arquivo**:")
     
-    for ext, count in sorted(file_types.items(), key=lambda x: x[1], reverse=True):
+    for ext, count in file_types.most_common():
         if ext:
             lines.append(f"  - `{ext}`: {count} arquivo(s)")
     
     lines.append("")
     
     # Salva o arquivo
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(lines))
+    write_document(output_file, lines)
     
     print(f"✅ Gerado: {output_file}")
 
@@ -321,9 +363,7 @@ def generate_main_readme():
     lines.append("```")
     
     # Salva
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(lines))
+    write_document(output_file, lines)
     
     print(f"✅ Gerado: {output_file}")
 
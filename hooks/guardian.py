@@ -6,39 +6,315 @@ Focuses on prevention with minimal interruptions.
 """
 
 import sys
-import json
 import re
 import os
-from datetime import datetime
-from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Any
+import io
 import ast
+import hashlib
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, List, Tuple, Optional, Any
+
+# Optional: Hyperscan scans all line patterns in one pass over the file
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Optional: orjson parses the config faster than the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# json, datetime, pathlib and concurrent.futures are imported where they are used:
+# this hook runs on every Write/Edit and most runs never reach those code paths.
+
+# Parsed configs keyed by (path, mtime), shared by Guardian instances in one process
+_config_cache: Dict[Tuple[str, float], Dict[str, Any]] = {}
+
+def _sources(patterns: List[Tuple["re.Pattern", str]]) -> Tuple[str, ...]:
+    """Pattern sources of a category, used as the key of its union regex"""
+    return tuple(pattern.pattern for pattern, _ in patterns)
+
+@lru_cache(maxsize=None)
+def _union(sources: Tuple[str, ...]) -> "re.Pattern":
+    """Combine a category's patterns into a single alternation regex.
+    
+    Compiled on the first line that passes the category's substring triggers
+    and shared by every Guardian instance afterwards.
+    """
+    return re.compile('|'.join(f'(?:{source})' for source in sources))
+
+# A line that starts another function, which ends the window searched after an async def
+_NOT_DEF_LINE = r'(?![ \t]*(?:async[ \t]+)?def\b)'
 
+def _async_call_pattern(call: str) -> "re.Pattern":
+    """A call on an async def line or up to 5 lines below it, stopping at the next def"""
+    return re.compile(rf'async\s+def\b[^\n]*?(?:\n(?:{_NOT_DEF_LINE}[^\n]*\n){{0,4}}?{_NOT_DEF_LINE}[^\n]*?)?{call}')
+
+
+@dataclass(slots=True, frozen=True)
 class SecurityIssue:
     """Represents a security issue found in code"""
-    def __init__(self, severity: str, line: int, message: str, 
-                 fix_suggestion: str, learn_more: str = ""):
-        self.severity = severity
-        self.line = line
-        self.message = message
-        self.fix_suggestion = fix_suggestion
-        self.learn_more = learn_more
+    severity: str
+    line: int
+    message: str
+    fix_suggestion: str
+    learn_more: str = ""
+
+class CodeVisitor(ast.NodeVisitor):
+    """Finds hardcoded secrets and SQL built from variables in the parsed code"""
+    
+    # Name suffixes checked in order; the first match names the issue
+    SECRET_NAMES = [
+        (("password", "passwd", "pwd"), "Hardcoded password"),
+        (("api_key", "apikey", "api_secret"), "Hardcoded API key"),
+        (("secret_key", "secret"), "Hardcoded secret"),
+        (("token",), "Hardcoded token"),
+    ]
+    DB_URL_PATTERN = re.compile(r'(postgresql|mysql|mongodb)://[^@]+:[^@]+@', re.IGNORECASE)
+    SQL_CALLS = {"execute", "query"}
+    SQL_KEYWORD_PATTERN = re.compile(r'\b(SELECT|INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+    
+    def __init__(self):
+        self.sql: List[Tuple[int, str]] = []
+        self.secrets: List[Tuple[int, str]] = []
+    
+    def visit_Expr(self, node: ast.Expr):
+        # Bare strings are docstrings, not code
+        if isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            return
+        self.generic_visit(node)
+    
+    def visit_Assign(self, node: ast.Assign):
+        for target in node.targets:
+            self._check_secret(self._target_name(target), node.value, target.lineno)
+        self.generic_visit(node)
+    
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        if node.value is not None:
+            self._check_secret(self._target_name(node.target), node.value, node.target.lineno)
+        self.generic_visit(node)
+    
+    def visit_keyword(self, node: ast.keyword):
+        self._check_secret(node.arg, node.value, node.value.lineno)
+        self.generic_visit(node)
+    
+    def visit_arguments(self, node: ast.arguments):
+        positional = node.posonlyargs + node.args
+        for arg, default in zip(positional[len(positional) - len(node.defaults):], node.defaults):
+            self._check_secret(arg.arg, default, arg.lineno)
+        for arg, default in zip(node.kwonlyargs, node.kw_defaults):
+            if default is not None:
+                self._check_secret(arg.arg, default, arg.lineno)
+        self.generic_visit(node)
+    
+    def visit_Call(self, node: ast.Call):
+        # Defaults passed to os.getenv / os.environ.get are not reported
+        if self._is_env_lookup(node.func):
+            return
+        
+        func_name = self._target_name(node.func)
+        if func_name and func_name.lower() in self.SQL_CALLS and node.args:
+            self._check_sql_argument(node.args[0])
+        self.generic_visit(node)
+    
+    def visit_BinOp(self, node: ast.BinOp):
+        if not isinstance(node.op, ast.Add):
+            self.generic_visit(node)
+            return
+        
+        # Check a whole "a" + b + "c" chain once, at its outermost node
+        operands = self._flatten_add(node)
+        has_sql = any(self._is_str(op) and self.SQL_KEYWORD_PATTERN.search(op.value) for op in operands)
+        if has_sql and not all(isinstance(op, ast.Constant) for op in operands):
+            self.sql.append((node.lineno, "Direct variable in SQL query"))
+        
+        for operand in operands:
+            self.visit(operand)
+    
+    def visit_Constant(self, node: ast.Constant):
+        if isinstance(node.value, str) and self.DB_URL_PATTERN.search(node.value):
+            self.secrets.append((node.lineno, "Hardcoded database credentials"))
+    
+    def _check_secret(self, name: Optional[str], value: ast.AST, line: int):
+        if not name or not self._is_str(value) or not value.value:
+            return
+        
+        name = name.lower()
+        for suffixes, issue_type in self.SECRET_NAMES:
+            if name.endswith(suffixes):
+                self.secrets.append((line, issue_type))
+                return
+    
+    def _check_sql_argument(self, arg: ast.AST):
+        if isinstance(arg, ast.JoinedStr):
+            if any(isinstance(value, ast.FormattedValue) for value in arg.values):
+                self.sql.append((arg.lineno, "SQL Injection via f-string"))
+        elif isinstance(arg, ast.BinOp) and isinstance(arg.op, ast.Add):
+            if not all(isinstance(op, ast.Constant) for op in self._flatten_add(arg)):
+                self.sql.append((arg.lineno, "SQL Injection via concatenation"))
+        elif isinstance(arg, ast.BinOp) and isinstance(arg.op, ast.Mod) and self._is_str(arg.left):
+            self.sql.append((arg.lineno, "SQL Injection via % formatting"))
+        elif (isinstance(arg, ast.Call) and isinstance(arg.func, ast.Attribute)
+                and arg.func.attr == "format" and self._is_str(arg.func.value)):
+            self.sql.append((arg.lineno, "SQL Injection via .format()"))
+    
+    @staticmethod
+    def _target_name(node: ast.AST) -> Optional[str]:
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            return node.attr
+        return None
+    
+    @staticmethod
+    def _is_str(node: ast.AST) -> bool:
+        return isinstance(node, ast.Constant) and isinstance(node.value, str)
+    
+    @staticmethod
+    def _is_env_lookup(func: ast.AST) -> bool:
+        if not isinstance(func, ast.Attribute):
+            return False
+        if func.attr == "getenv":
+            return True
+        return (func.attr == "get" and isinstance(func.value, ast.Attribute)
+                and func.value.attr == "environ")
+    
+    @staticmethod
+    def _flatten_add(node: ast.BinOp) -> List[ast.AST]:
+        operands = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, ast.BinOp) and isinstance(current.op, ast.Add):
+                stack.append(current.right)
+                stack.append(current.left)
+            else:
+                operands.append(current)
+        return operands
+
 
 class Guardian:
     """Main security analyzer for new code"""
     
+    # Patterns are compiled once and shared by every Guardian instance.
+    # Line patterns are lowercase and run against the lowercased line, which is
+    # cheaper than re.IGNORECASE; the async patterns match Python keywords, which are case-sensitive.
+    SQL_PATTERNS = [
+        # F-string SQL
+        (re.compile(r'(execute|query)\s*\(\s*f["\'].*{.*}.*["\']'), "SQL Injection via f-string"),
+        # String concatenation
+        (re.compile(r'(execute|query)\s*\(\s*["\'].*["\'].*\+'), "SQL Injection via concatenation"),
+        # .format() SQL
+        (re.compile(r'(execute|query)\s*\(\s*["\'].*{}.*["\']\s*\.format'), "SQL Injection via .format()"),
+        # % formatting
+        (re.compile(r'(execute|query)\s*\(\s*["\'].*%s.*["\'].*%'), "SQL Injection via % formatting"),
+        # Direct variable in SQL
+        (re.compile(r'(select|insert|update|delete).*\+\s*\w+'), "Direct variable in SQL query"),
+    ]
+    SQL_SOURCES = _sources(SQL_PATTERNS)
+    SQL_TRIGGERS = ("execute", "query", "select", "insert", "update", "delete")
+    
+    SECRET_PATTERNS = [
+        (re.compile(r'(password|passwd|pwd)\s*=\s*["\'][^"\']+["\']'), "Hardcoded password"),
+        (re.compile(r'(api_key|apikey|api_secret)\s*=\s*["\'][^"\']+["\']'), "Hardcoded API key"),
+        (re.compile(r'(secret_key|secret)\s*=\s*["\'][^"\']+["\']'), "Hardcoded secret"),
+        (re.compile(r'(token|access_token|refresh_token)\s*=\s*["\'][^"\']+["\']'), "Hardcoded token"),
+        (re.compile(r'postgresql://[^@]+:[^@]+@'), "Hardcoded database credentials"),
+        (re.compile(r'mysql://[^@]+:[^@]+@'), "Hardcoded database credentials"),
+        (re.compile(r'mongodb://[^@]+:[^@]+@'), "Hardcoded database credentials"),
+    ]
+    SECRET_SOURCES = _sources(SECRET_PATTERNS)
+    SECRET_TRIGGERS = ("password", "passwd", "pwd", "api_key", "apikey", "secret", "token", "://")
+    
+    ENDPOINT_PATTERN = re.compile(r'@(app|router)\.(get|post|put|delete|patch)')
+    AUTH_MARKERS = ['Depends', 'Security', 'HTTPBearer', 'OAuth2']
+    PUBLIC_ENDPOINTS = ['health', 'docs', 'openapi', 'metrics', 'root']
+    
+    SENSITIVE_FIELDS = ['password', 'email', 'cpf', 'credit_card', 'phone', 'ssn']
+    
+    JWT_PATTERNS = [
+        (re.compile(r'jwt\.encode.*algorithm\s*=\s*["\']hs256["\'].*secret\s*=\s*["\'][^"\']{1,10}["\']'),
+         "Weak JWT secret key"),
+        (re.compile(r'verify_password.*=='), "Timing attack vulnerability in password comparison"),
+        (re.compile(r'md5|sha1'), "Weak hashing algorithm"),
+    ]
+    JWT_SOURCES = _sources(JWT_PATTERNS)
+    JWT_TRIGGERS = ("jwt", "verify_password", "md5", "sha1")
+    
+    # Matched against the whole content: a blocking call in the first lines of an async def
+    ASYNC_PATTERNS = [
+        (_async_call_pattern(r'time\.sleep'), "Blocking sleep in async function"),
+        (_async_call_pattern(r'requests\.(get|post|put|delete)'), "Sync HTTP call in async function"),
+        (re.compile(r'def[^\n]*await'), "await in non-async function"),
+    ]
+    
+    LOG_PATTERNS = [
+        (re.compile(r'(log|logger|print).*password'), "Password in logs"),
+        (re.compile(r'(log|logger|print).*token'), "Token in logs"),
+        (re.compile(r'(log|logger|print).*credit_card'), "Credit card in logs"),
+    ]
+    LOG_SOURCES = _sources(LOG_PATTERNS)
+    LOG_TRIGGERS = ("password", "token", "credit_card")
+    
+    # Cheap per-line gate for each line-pattern category: trigger substrings, then the union regex
+    CATEGORY_GATES = {
+        "sql": (SQL_TRIGGERS, SQL_SOURCES),
+        "secret": (SECRET_TRIGGERS, SECRET_SOURCES),
+        "jwt": (JWT_TRIGGERS, JWT_SOURCES),
+        "log": (LOG_TRIGGERS, LOG_SOURCES),
+    }
+    
+    # (database, category per pattern id) built on first use, False if Hyperscan can't compile them
+    _hyperscan_db = None
+    
+    FUNCTION_NAME_PATTERN = re.compile(r'def\s+(\w+)')
+    
+    SEVERITY_EMOJI = {"CRITICAL": "🚨", "HIGH": "❌", "MEDIUM": "⚠️", "LOW": "ℹ️"}
+    
+    CACHE_DIR = ".claude/guardian_cache"
+    # Entries kept per two-hex-digit shard directory, so at most 256 times this many overall
+    CACHE_SHARD_MAX_ENTRIES = 64
+    
+    # Batch analysis only pays for the process pool from this many files on
+    PARALLEL_MIN_FILES = 4
+    PARALLEL_BATCH_SIZE = 64
+    
     def __init__(self, config_path: str = "hooks/guardian_config.json"):
+        self.config_path = config_path
         self.config = self._load_config(config_path)
         self.issues: List[SecurityIssue] = []
         self.file_path = ""
         self.content = ""
         self.lines: List[str] = []
+        self._line_starts: List[int] = []
+        self._tree: Optional[ast.AST] = None
+        # Ignored paths match anywhere in the file path, so they are folded into
+        # one escaped alternation instead of a substring test per entry
+        ignored_paths = self.config.get("ignored_paths", [])
+        self._ignored_re: Optional["re.Pattern"] = (
+            re.compile("|".join(map(re.escape, ignored_paths))) if ignored_paths else None
+        )
         
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from JSON file"""
         try:
-            with open(config_path, 'r') as f:
-                return json.load(f)
+            key = (config_path, os.stat(config_path).st_mtime)
+            config = _config_cache.get(key)
+            if config is None:
+                with open(config_path, 'rb') as f:
+                    raw = f.read()
+                if orjson is not None:
+                    config = orjson.loads(raw)
+                else:
+                    import json
+                    config = json.loads(raw)
+                _config_cache[key] = config
+            return config
         except FileNotFoundError:
             # Return default config if file doesn't exist
             return {
@@ -54,103 +330,189 @@ class Guardian:
         """Main analysis method"""
         self.file_path = file_path
         self.content = content
-        self.lines = content.split('\n')
         self.issues = []
         
-        # Skip if in ignored paths
-        if any(ignored in file_path for ignored in self.config.get("ignored_paths", [])):
+        # Skip if in ignored paths, before any per-line work
+        if self._ignored_re is not None and self._ignored_re.search(file_path):
+            self.lines = []
+            self._line_starts = []
             return []
         
+        # Only '\n' ends a line, as for the ast line numbers; splitlines() also
+        # breaks on form feeds, \x85, \u2028 and other separators
+        self.lines = content.split('\n')
+        self._line_starts = list(accumulate((len(line) + 1 for line in self.lines), initial=0))
+        
+        # SQL and secret checks use the AST when the code parses
+        try:
+            self._tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            self._tree = None
+        
         # Run all security checks
-        self._check_sql_security()
-        self._check_hardcoded_secrets()
-        self._check_fastapi_security()
-        self._check_pydantic_security()
-        self._check_authentication()
-        self._check_async_patterns()
-        self._check_data_protection()
+        self._scan_lines()
+        
+        # Drop exact duplicates reported by overlapping checks, keeping order
+        self.issues = list(dict.fromkeys(self.issues))
         
         return self.issues
     
-    def _check_sql_security(self):
-        """Check for SQL injection vulnerabilities"""
-        sql_patterns = [
-            # F-string SQL
-            (r'(execute|query)\s*\(\s*f["\'].*{.*}.*["\']', "SQL Injection via f-string"),
-            # String concatenation
-            (r'(execute|query)\s*\(\s*["\'].*["\'].*\+', "SQL Injection via concatenation"),
-            # .format() SQL
-            (r'(execute|query)\s*\(\s*["\'].*{}.*["\']\s*\.format', "SQL Injection via .format()"),
-            # % formatting
-            (r'(execute|query)\s*\(\s*["\'].*%s.*["\'].*%', "SQL Injection via % formatting"),
-            # Direct variable in SQL
-            (r'(SELECT|INSERT|UPDATE|DELETE).*\+\s*\w+', "Direct variable in SQL query"),
-        ]
+    def analyze_files(self, files: List[Tuple[str, str]]) -> Dict[str, List[SecurityIssue]]:
+        """Analyze several (file_path, content) pairs, in worker processes when there are enough of them"""
+        if len(files) < self.PARALLEL_MIN_FILES:
+            return {file_path: self.analyze_file(file_path, content) for file_path, content in files}
         
-        for i, line in enumerate(self.lines, 1):
-            for pattern, issue_type in sql_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    # Skip if it's in a comment or string
-                    if line.strip().startswith('#') or line.strip().startswith('"""'):
-                        continue
-                        
-                    self.issues.append(SecurityIssue(
-                        severity="HIGH",
-                        line=i,
-                        message=f"{issue_type} detected",
-                        fix_suggestion="Use parameterized queries: text('SELECT * FROM users WHERE id = :id')",
-                        learn_more="https://owasp.org/www-community/attacks/SQL_Injection"
-                    ))
-    
-    def _check_hardcoded_secrets(self):
-        """Check for hardcoded secrets and credentials"""
-        secret_patterns = [
-            (r'(password|passwd|pwd)\s*=\s*["\'][^"\']+["\']', "Hardcoded password"),
-            (r'(api_key|apikey|api_secret)\s*=\s*["\'][^"\']+["\']', "Hardcoded API key"),
-            (r'(secret_key|secret)\s*=\s*["\'][^"\']+["\']', "Hardcoded secret"),
-            (r'(token|access_token|refresh_token)\s*=\s*["\'][^"\']+["\']', "Hardcoded token"),
-            (r'postgresql://[^@]+:[^@]+@', "Hardcoded database credentials"),
-            (r'mysql://[^@]+:[^@]+@', "Hardcoded database credentials"),
-            (r'mongodb://[^@]+:[^@]+@', "Hardcoded database credentials"),
-        ]
+        from concurrent.futures import ProcessPoolExecutor
         
-        for i, line in enumerate(self.lines, 1):
-            # Skip if it's getting from environment
-            if 'os.getenv' in line or 'os.environ' in line:
-                continue
-                
-            for pattern, issue_type in secret_patterns:
-                if match := re.search(pattern, line, re.IGNORECASE):
-                    # Skip if it's a variable assignment from env
-                    if '= os.' in line or '= settings.' in line:
-                        continue
-                        
-                    self.issues.append(SecurityIssue(
-                        severity="CRITICAL",
-                        line=i,
-                        message=f"{issue_type} detected",
-                        fix_suggestion="Use environment variables: os.getenv('SECRET_KEY')",
-                        learn_more="https://12factor.net/config"
-                    ))
-    
-    def _check_fastapi_security(self):
-        """Check FastAPI-specific security issues"""
-        # Check for endpoints without authentication
-        auth_decorators = ['Depends', 'Security', 'HTTPBearer', 'OAuth2']
-        endpoint_pattern = r'@(app|router)\.(get|post|put|delete|patch)'
+        workers = os.cpu_count() or 1
+        chunksize = max(1, min(self.PARALLEL_BATCH_SIZE, len(files) // workers))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.config_path,)) as pool:
+            results = pool.map(_analyze_in_worker, files, chunksize=chunksize)
+            return {file_path: issues for (file_path, _), issues in zip(files, results)}
+    
+    def analyze_file_cached(self, file_path: str, raw: bytes) -> List[SecurityIssue]:
+        """
+        Analyze raw file bytes, reusing the stored result when the same content was already analyzed.
+        The bytes are only decoded when the analysis actually has to run.
+        """
+        key = self._cache_key(file_path, raw)
+        
+        cached = self._load_cached_issues(key)
+        if cached is not None:
+            self.file_path = file_path
+            self.issues = cached
+            return cached
+        
+        issues = self.analyze_file(file_path, raw.decode('utf-8', errors='replace'))
+        self._store_cached_issues(key, issues)
+        return issues
+    
+    def _cache_key(self, file_path: str, raw: bytes) -> str:
+        """Hash the content together with everything else that affects the result"""
+        digest = hashlib.sha256()
+        for source in (__file__, self.config_path):
+            try:
+                digest.update(str(os.stat(source).st_mtime_ns).encode())
+            except OSError:
+                digest.update(b'-')
+            digest.update(b'\0')
+        digest.update(file_path.encode('utf-8', errors='replace'))
+        digest.update(b'\0')
+        digest.update(raw)
+        return digest.hexdigest()
+    
+    def _cache_file(self, key: str) -> str:
+        return os.path.join(self.CACHE_DIR, key[:2], f"{key}.json")
+    
+    def _load_cached_issues(self, key: str) -> Optional[List[SecurityIssue]]:
+        """Load cached issues, or None on a cache miss"""
+        import json
+        
+        try:
+            with open(self._cache_file(key), 'r', encoding='utf-8') as f:
+                return [SecurityIssue(**data) for data in json.load(f)]
+        except (OSError, ValueError, TypeError):
+            return None
+    
+    def _store_cached_issues(self, key: str, issues: List[SecurityIssue]):
+        """Store issues atomically so concurrent hooks never read a partial file"""
+        import json
+        
+        cache_file = self._cache_file(key)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump([asdict(issue) for issue in issues], f)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            # Caching is best effort and must never block the hook
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+            return
+        
+        self._prune_cache_shard(os.path.dirname(cache_file))
+    
+    def _prune_cache_shard(self, shard_dir: str):
+        """Remove the oldest entries of a cache shard beyond CACHE_SHARD_MAX_ENTRIES"""
+        try:
+            with os.scandir(shard_dir) as it:
+                entries = [entry for entry in it if entry.name.endswith('.json')]
+            if len(entries) <= self.CACHE_SHARD_MAX_ENTRIES:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+            for entry in entries[:-self.CACHE_SHARD_MAX_ENTRIES]:
+                os.remove(entry.path)
+        except OSError:
+            # Another hook may be pruning the same shard
+            pass
+    
+    def _scan_lines(self):
+        """Run every line-based security check in a single pass over the file"""
+        # Issues are bucketed per check so the report keeps its usual ordering
+        sql_issues: List[SecurityIssue] = []
+        secret_issues: List[SecurityIssue] = []
+        
+        if self._tree is not None:
+            visitor = CodeVisitor()
+            visitor.visit(self._tree)
+            sql_issues = [self._sql_issue(line, issue_type) for line, issue_type in visitor.sql]
+            secret_issues = [self._secret_issue(line, issue_type) for line, issue_type in visitor.secrets]
+        
+        endpoint_issues: List[SecurityIssue] = []
+        model_issues: List[SecurityIssue] = []
+        auth_issues: List[SecurityIssue] = []
+        async_issues: List[SecurityIssue] = []
+        log_issues: List[SecurityIssue] = []
         
+        # FastAPI endpoint state
         in_endpoint = False
         endpoint_line = 0
         has_auth = False
         
+        # Pydantic model state
+        in_model = False
+        
+        # Lines that may match each category, found in one Hyperscan pass when it's available
+        candidates = self._hyperscan_candidates()
+        
         for i, line in enumerate(self.lines, 1):
-            if re.search(endpoint_pattern, line):
+            line_lower = line.lower()
+            stripped = line.strip()
+            
+            # SQL injection and hardcoded secrets fall back to regexes when the code doesn't parse
+            if self._tree is None:
+                if self._line_gate(candidates, "sql", i, line, line_lower):
+                    for pattern, issue_type in self.SQL_PATTERNS:
+                        if pattern.search(line_lower):
+                            # Skip if it's in a comment or string
+                            if stripped.startswith('#') or stripped.startswith('"""'):
+                                continue
+                            
+                            sql_issues.append(self._sql_issue(i, issue_type))
+                
+                # Skip if it's getting from environment
+                if ('os.getenv' not in line and 'os.environ' not in line
+                        and self._line_gate(candidates, "secret", i, line, line_lower)):
+                    for pattern, issue_type in self.SECRET_PATTERNS:
+                        if pattern.search(line_lower):
+                            # Skip if it's a variable assignment from env
+                            if '= os.' in line or '= settings.' in line:
+                                continue
+                            
+                            secret_issues.append(self._secret_issue(i, issue_type))
+            
+            # FastAPI endpoints without authentication
+            if self.ENDPOINT_PATTERN.search(line):
                 # Check previous endpoint
                 if in_endpoint and not has_auth:
                     # Check if it's a public endpoint
                     func_name = self._get_function_name(endpoint_line)
-                    if func_name not in ['health', 'docs', 'openapi', 'metrics', 'root']:
-                        self.issues.append(SecurityIssue(
+                    if func_name not in self.PUBLIC_ENDPOINTS:
+                        endpoint_issues.append(SecurityIssue(
                             severity="HIGH",
                             line=endpoint_line,
                             message="Endpoint without authentication",
@@ -162,39 +524,21 @@ class Guardian:
                 endpoint_line = i
                 has_auth = False
             
-            if in_endpoint and any(auth in line for auth in auth_decorators):
+            if in_endpoint and any(auth in line for auth in self.AUTH_MARKERS):
                 has_auth = True
-        
-        # Check CORS wildcard
-        if 'allow_origins=["*"]' in self.content or 'allow_origins = ["*"]' in self.content:
-            self.issues.append(SecurityIssue(
-                severity="HIGH",
-                line=self._find_line('allow_origins=["*"]'),
-                message="CORS wildcard origin detected",
-                fix_suggestion='Use specific origins: allow_origins=["https://example.com"]',
-                learn_more="https://developer.mozilla.org/en-US/docs/Web/HTTP/CORS"
-            ))
-    
-    def _check_pydantic_security(self):
-        """Check Pydantic model security"""
-        sensitive_fields = ['password', 'email', 'cpf', 'credit_card', 'phone', 'ssn']
-        
-        in_model = False
-        model_line = 0
-        
-        for i, line in enumerate(self.lines, 1):
+            
+            # Pydantic model fields
             if 'class' in line and ('BaseModel' in line or 'Model' in line):
                 in_model = True
-                model_line = i
-            elif in_model and line.strip() and not line.startswith(' '):
+            elif in_model and stripped and not line.startswith(' '):
                 in_model = False
             
             if in_model:
-                for field in sensitive_fields:
+                for field in self.SENSITIVE_FIELDS:
                     if f'{field}:' in line or f'{field} :' in line:
                         # Check for proper validation
                         if field == 'password' and 'str' in line and 'SecretStr' not in line:
-                            self.issues.append(SecurityIssue(
+                            model_issues.append(SecurityIssue(
                                 severity="HIGH",
                                 line=i,
                                 message="Password field without SecretStr",
@@ -202,95 +546,180 @@ class Guardian:
                                 learn_more="https://docs.pydantic.dev/latest/usage/types/secrets/"
                             ))
                         elif field == 'email' and 'str' in line and 'EmailStr' not in line:
-                            self.issues.append(SecurityIssue(
+                            model_issues.append(SecurityIssue(
                                 severity="MEDIUM",
                                 line=i,
                                 message="Email field without EmailStr validation",
                                 fix_suggestion="Use EmailStr for email validation: email: EmailStr",
                                 learn_more="https://docs.pydantic.dev/latest/usage/types/string/"
                             ))
-    
-    def _check_authentication(self):
-        """Check authentication and authorization issues"""
-        # Check JWT configuration
-        jwt_patterns = [
-            (r'jwt\.encode.*algorithm\s*=\s*["\']HS256["\'].*secret\s*=\s*["\'][^"\']{1,10}["\']', 
-             "Weak JWT secret key"),
-            (r'verify_password.*==', "Timing attack vulnerability in password comparison"),
-            (r'md5|sha1', "Weak hashing algorithm"),
-        ]
-        
-        for i, line in enumerate(self.lines, 1):
-            for pattern, issue_type in jwt_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    if 'md5' in line.lower() or 'sha1' in line.lower():
-                        self.issues.append(SecurityIssue(
-                            severity="HIGH",
-                            line=i,
-                            message=f"{issue_type} detected",
-                            fix_suggestion="Use bcrypt or argon2 for password hashing",
-                            learn_more="https://cheatsheetseries.owasp.org/cheatsheets/Password_Storage_Cheat_Sheet.html"
-                        ))
-                    else:
-                        self.issues.append(SecurityIssue(
+            
+            # JWT configuration and weak hashing
+            if self._line_gate(candidates, "jwt", i, line, line_lower):
+                for pattern, issue_type in self.JWT_PATTERNS:
+                    if pattern.search(line_lower):
+                        if 'md5' in line_lower or 'sha1' in line_lower:
+                            auth_issues.append(SecurityIssue(
+                                severity="HIGH",
+                                line=i,
+                                message=f"{issue_type} detected",
+                                fix_suggestion="Use bcrypt or argon2 for password hashing",
+                                learn_more="https://cheatsheetseries.owasp.org/cheatsheets/Password_Storage_Cheat_Sheet.html"
+                            ))
+                        else:
+                            auth_issues.append(SecurityIssue(
+                                severity="HIGH",
+                                line=i,
+                                message=f"{issue_type} detected",
+                                fix_suggestion="Use strong secrets and secure comparison",
+                                learn_more="https://owasp.org/www-project-cheat-sheets/"
+                            ))
+            
+            # Sensitive data in logs
+            if self._line_gate(candidates, "log", i, line, line_lower):
+                for pattern, issue_type in self.LOG_PATTERNS:
+                    if pattern.search(line_lower):
+                        log_issues.append(SecurityIssue(
                             severity="HIGH",
                             line=i,
                             message=f"{issue_type} detected",
-                            fix_suggestion="Use strong secrets and secure comparison",
-                            learn_more="https://owasp.org/www-project-cheat-sheets/"
+                            fix_suggestion="Mask sensitive data before logging",
+                            learn_more="https://owasp.org/www-project-logging-cheat-sheet/"
                         ))
+        
+        # Async/await issues span several lines, so they are matched over the whole content
+        for pattern, issue_type in self.ASYNC_PATTERNS:
+            for match in pattern.finditer(self.content):
+                async_issues.append(SecurityIssue(
+                    severity="MEDIUM",
+                    line=self._line_number(match.start()),
+                    message=f"{issue_type} detected",
+                    fix_suggestion="Use asyncio.sleep() or httpx for async operations",
+                    learn_more="https://docs.python.org/3/library/asyncio.html"
+                ))
+        
+        # Check CORS wildcard
+        cors_line = self._find_line('allow_origins=["*"]', 'allow_origins = ["*"]') if 'allow_origins' in self.content else 0
+        if cors_line:
+            endpoint_issues.append(SecurityIssue(
+                severity="HIGH",
+                line=cors_line,
+                message="CORS wildcard origin detected",
+                fix_suggestion='Use specific origins: allow_origins=["https://example.com"]',
+                learn_more="https://developer.mozilla.org/en-US/docs/Web/HTTP/CORS"
+            ))
+        
+        self.issues.extend(sql_issues)
+        self.issues.extend(secret_issues)
+        self.issues.extend(endpoint_issues)
+        self.issues.extend(model_issues)
+        self.issues.extend(auth_issues)
+        self.issues.extend(async_issues)
+        self.issues.extend(log_issues)
     
-    def _check_async_patterns(self):
-        """Check for async/await issues"""
-        async_issues = [
-            (r'async def.*\n.*time\.sleep', "Blocking sleep in async function"),
-            (r'async def.*\n.*requests\.(get|post|put|delete)', "Sync HTTP call in async function"),
-            (r'def.*await', "await in non-async function"),
-        ]
+    def _line_gate(self, candidates: Optional[Dict[str, set]], category: str,
+                   line_number: int, line: str, line_lower: str) -> bool:
+        """Whether a line is worth trying against the individual patterns of a category"""
+        # Hyperscan folds case on ASCII bytes only, which is not the same as lower(),
+        # so non-ASCII lines go straight to the re patterns
+        if not line.isascii():
+            return True
+        if candidates is not None:
+            return line_number in candidates[category]
         
-        for i, line in enumerate(self.lines, 1):
-            for pattern, issue_type in async_issues:
-                if re.search(pattern, line + '\n' + '\n'.join(self.lines[i:i+5]), re.IGNORECASE):
-                    self.issues.append(SecurityIssue(
-                        severity="MEDIUM",
-                        line=i,
-                        message=f"{issue_type} detected",
-                        fix_suggestion="Use asyncio.sleep() or httpx for async operations",
-                        learn_more="https://docs.python.org/3/library/asyncio.html"
-                    ))
-    
-    def _check_data_protection(self):
-        """Check data protection issues"""
-        # Check for logging sensitive data
-        log_patterns = [
-            (r'(log|logger|print).*password', "Password in logs"),
-            (r'(log|logger|print).*token', "Token in logs"),
-            (r'(log|logger|print).*credit_card', "Credit card in logs"),
-        ]
+        triggers, sources = self.CATEGORY_GATES[category]
+        return any(trigger in line_lower for trigger in triggers) and _union(sources).search(line_lower) is not None
+    
+    @classmethod
+    def _get_hyperscan_db(cls):
+        """Compile every line pattern into a single Hyperscan database, once per process"""
+        if hyperscan is None:
+            return None
         
-        for i, line in enumerate(self.lines, 1):
-            for pattern, issue_type in log_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    self.issues.append(SecurityIssue(
-                        severity="HIGH",
-                        line=i,
-                        message=f"{issue_type} detected",
-                        fix_suggestion="Mask sensitive data before logging",
-                        learn_more="https://owasp.org/www-project-logging-cheat-sheet/"
-                    ))
-    
-    def _find_line(self, text: str) -> int:
-        """Find line number containing text"""
-        for i, line in enumerate(self.lines, 1):
-            if text in line:
-                return i
-        return 1
+        if cls._hyperscan_db is None:
+            expressions = []
+            categories = []
+            for category, patterns in (("sql", cls.SQL_PATTERNS), ("secret", cls.SECRET_PATTERNS),
+                                       ("jwt", cls.JWT_PATTERNS), ("log", cls.LOG_PATTERNS)):
+                for pattern, _ in patterns:
+                    expressions.append(pattern.pattern.encode())
+                    categories.append(category)
+            
+            db = hyperscan.Database()
+            try:
+                db.compile(
+                    expressions=expressions,
+                    ids=list(range(len(expressions))),
+                    elements=len(expressions),
+                    flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST] * len(expressions),
+                )
+                cls._hyperscan_db = (db, categories)
+            except hyperscan.error:
+                # Fall back to the re-based gates
+                cls._hyperscan_db = False
+        
+        return cls._hyperscan_db or None
+    
+    def _hyperscan_candidates(self) -> Optional[Dict[str, set]]:
+        """Scan the whole file once and return, per category, the line numbers with a match"""
+        compiled = self._get_hyperscan_db()
+        if compiled is None:
+            return None
+        
+        db, categories = compiled
+        data = self.content.encode('utf-8', errors='replace')
+        
+        # Hyperscan reports byte offsets
+        if self.content.isascii():
+            line_starts = self._line_starts
+        else:
+            line_starts = list(accumulate(
+                (len(line.encode('utf-8', errors='replace')) + 1 for line in self.lines),
+                initial=0,
+            ))
+        
+        candidates: Dict[str, set] = {category: set() for category in self.CATEGORY_GATES}
+        
+        def on_match(pattern_id, start, end, flags, context):
+            first = bisect_right(line_starts, start)
+            last = bisect_right(line_starts, max(start, end - 1))
+            candidates[categories[pattern_id]].update(range(first, last + 1))
+        
+        db.scan(data, match_event_handler=on_match)
+        return candidates
+    
+    def _sql_issue(self, line: int, issue_type: str) -> SecurityIssue:
+        return SecurityIssue(
+            severity="HIGH",
+            line=line,
+            message=f"{issue_type} detected",
+            fix_suggestion="Use parameterized queries: text('SELECT * FROM users WHERE id = :id')",
+            learn_more="https://owasp.org/www-community/attacks/SQL_Injection"
+        )
+    
+    def _secret_issue(self, line: int, issue_type: str) -> SecurityIssue:
+        return SecurityIssue(
+            severity="CRITICAL",
+            line=line,
+            message=f"{issue_type} detected",
+            fix_suggestion="Use environment variables: os.getenv('SECRET_KEY')",
+            learn_more="https://12factor.net/config"
+        )
+    
+    def _line_number(self, offset: int) -> int:
+        """Map a character offset in the content to its 1-based line number"""
+        return bisect_right(self._line_starts, offset)
+    
+    def _find_line(self, *texts: str) -> int:
+        """Find the first line containing any of the texts, or 0 if none is present"""
+        offsets = [offset for offset in map(self.content.find, texts) if offset >= 0]
+        return self._line_number(min(offsets)) if offsets else 0
     
     def _get_function_name(self, start_line: int) -> str:
         """Extract function name from decorator line"""
         for i in range(start_line, min(start_line + 5, len(self.lines))):
             if 'def ' in self.lines[i]:
-                match = re.search(r'def\s+(\w+)', self.lines[i])
+                match = self.FUNCTION_NAME_PATTERN.search(self.lines[i])
                 if match:
                     return match.group(1)
         return ""
@@ -300,48 +729,61 @@ class Guardian:
         if not issues:
             return ""
         
+        from datetime import datetime
+        
+        # Group issues by severity in a single pass
+        by_severity: Dict[str, List[SecurityIssue]] = {severity: [] for severity in self.SEVERITY_EMOJI}
+        for issue in issues:
+            if issue.severity in by_severity:
+                by_severity[issue.severity].append(issue)
+        
         # Only block on critical issues
-        critical_issues = [i for i in issues if i.severity == "CRITICAL"]
+        critical_issues = by_severity["CRITICAL"]
         if self.config.get("guardian", {}).get("block_critical_only", True):
             if not critical_issues:
                 return ""  # Don't block, just log
         
-        report = []
-        report.append("=" * 62)
-        report.append("🛡️  GUARDIAN SECURITY CHECK")
-        report.append(f"📄 File: {self.file_path}")
-        report.append(f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append("=" * 62)
-        report.append("")
+        educational = self.config.get("guardian", {}).get("educational_messages", True)
+        
+        report = io.StringIO()
+        write = report.write
+        write("=" * 62 + "\n")
+        write("🛡️  GUARDIAN SECURITY CHECK\n")
+        write(f"📄 File: {self.file_path}\n")
+        write(f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        write("=" * 62 + "\n")
+        write("\n")
         
         if critical_issues:
-            report.append("🚨 BLOQUEADO: Vulnerabilidades Críticas Detectadas!")
-            report.append("")
+            write("🚨 BLOQUEADO: Vulnerabilidades Críticas Detectadas!\n")
+            write("\n")
         
-        # Group issues by severity
-        for severity in ["CRITICAL", "HIGH", "MEDIUM", "LOW"]:
-            severity_issues = [i for i in issues if i.severity == severity]
+        for severity, emoji in self.SEVERITY_EMOJI.items():
+            severity_issues = by_severity[severity]
             if severity_issues:
-                emoji = {"CRITICAL": "🚨", "HIGH": "❌", "MEDIUM": "⚠️", "LOW": "ℹ️"}[severity]
-                report.append(f"{emoji} {severity} ({len(severity_issues)} issues)")
-                report.append("-" * 40)
+                write(f"{emoji} {severity} ({len(severity_issues)} issues)\n")
+                write("-" * 40 + "\n")
                 
                 for issue in severity_issues:
-                    report.append(f"Line {issue.line}: {issue.message}")
-                    report.append(f"   ✅ Fix: {issue.fix_suggestion}")
-                    if issue.learn_more and self.config.get("guardian", {}).get("educational_messages", True):
-                        report.append(f"   📚 Learn more: {issue.learn_more}")
-                    report.append("")
+                    write(f"Line {issue.line}: {issue.message}\n")
+                    write(f"   ✅ Fix: {issue.fix_suggestion}\n")
+                    if issue.learn_more and educational:
+                        write(f"   📚 Learn more: {issue.learn_more}\n")
+                    write("\n")
         
-        report.append("=" * 62)
+        write("=" * 62)
         
         # Save report
-        self._save_report('\n'.join(report))
+        report_text = report.getvalue()
+        self._save_report(report_text)
         
-        return '\n'.join(report)
+        return report_text
     
     def _save_report(self, report: str):
         """Save report to file"""
+        from datetime import datetime
+        from pathlib import Path
+        
         report_dir = Path(".claude/security_reports")
         report_dir.mkdir(parents=True, exist_ok=True)
         
@@ -352,6 +794,20 @@ class Guardian:
             f.write(report)
 
 
+# Each worker process builds its Guardian once and reuses it for every file it receives
+_worker_guardian: Optional[Guardian] = None
+
+
+def _init_worker(config_path: str):
+    global _worker_guardian
+    _worker_guardian = Guardian(config_path)
+
+
+def _analyze_in_worker(item: Tuple[str, str]) -> List[SecurityIssue]:
+    file_path, content = item
+    return _worker_guardian.analyze_file(file_path, content)
+
+
 def main():
     """Main entry point for hook"""
     # Get file info from environment
@@ -367,12 +823,12 @@ def main():
     if not file_path.endswith('.py'):
         sys.exit(0)
     
-    # Read content from stdin
-    content = sys.stdin.read()
+    # Read content from stdin as bytes; it is decoded only if analysis has to run
+    raw = sys.stdin.buffer.read()
     
     # Analyze
     guardian = Guardian()
-    issues = guardian.analyze_file(file_path, content)
+    issues = guardian.analyze_file_cached(file_path, raw)
     
     if issues:
         # Check if we should block
@@ -387,8 +843,9 @@ def main():
             if report:
                 print(report, file=sys.stderr)
     
-    # Pass through the content
-    print(content, end='')
+    # Pass through the content untouched, skipping the text layer
+    sys.stdout.buffer.write(raw)
+    sys.stdout.buffer.flush()
     sys.exit(0)
 
 
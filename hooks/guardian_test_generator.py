@@ -6,15 +6,61 @@ Used by Legacy Guardian to ensure safe refactoring.
 """
 
 import ast
-import re
+import hashlib
+import os
+import string
+import sys
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
 from datetime import datetime
 
 
+# Generated suites are streamed to disk through a 64KB buffer
+WRITE_BUFFER_SIZE = 64 * 1024
+
+class _SlugTable(dict):
+    """str.translate table keeping ASCII letters, digits and '_' and mapping anything else to '_'"""
+    
+    def __missing__(self, codepoint: int) -> str:
+        self[codepoint] = '_'
+        return '_'
+
+
+_SLUG_TABLE = _SlugTable({ord(char): char for char in string.ascii_letters + string.digits + '_'})
+
+
+# Issue types and function names repeat across a suite, so their derived forms are cached
+@lru_cache(maxsize=1024)
+def _slug(text: str) -> str:
+    """Lowercase identifier-safe form of an issue type"""
+    return text.lower().translate(_SLUG_TABLE)
+
+
+@lru_cache(maxsize=1024)
+def _title(name: str) -> str:
+    """Title-cased function name used for its test class"""
+    return name.title()
+
+
 class TestGenerator:
     """Advanced test generation for production code safety"""
     
+    # Case-insensitive keywords checked in priority order after the "SQL" marker
+    TEST_TYPE_KEYWORDS = (
+        ("auth", "authentication"),
+        ("password", "password_security"),
+        ("endpoint", "api_endpoint"),
+    )
+    
+    # Batch generation only pays for the process pool from this many files on
+    PARALLEL_MIN_FILES = 4
+    PARALLEL_BATCH_SIZE = 16
+    
     def __init__(self):
         self.test_templates = {
             "sql_injection": self._sql_injection_template,
@@ -27,43 +73,76 @@ class TestGenerator:
         }
     
     def generate_test_suite(self, file_path: str, code_content: str, 
-                          issues: List[Dict]) -> str:
-        """Generate complete test suite for a file"""
-        module_info = self._analyze_module(file_path, code_content)
+                          issues: List[Dict], out: Optional[TextIO] = None,
+                          digest: Optional[bytes] = None) -> Optional[str]:
+        """Generate complete test suite for a file.
+        
+        When out is given the suite is streamed to it fragment by fragment and
+        None is returned; otherwise the suite is returned as a string. Callers
+        that read the file as bytes can pass its content_digest() as digest.
+        """
+        module_info = self._analyze_module(file_path, code_content, digest)
+        
+        # Without a stream, fragments are collected in a list and joined once at the end
+        parts: List[str] = []
+        write = parts.append if out is None else out.write
         
-        test_content = self._generate_header(file_path, module_info)
-        test_content += self._generate_imports(module_info)
-        test_content += self._generate_fixtures(module_info)
+        write(self._generate_header(file_path, module_info))
+        write(self._generate_imports(module_info))
+        write(self._generate_fixtures(module_info))
         
         # Generate tests for each function/class
+        issue_index = self._index_issues_by_line(issues)
         for item in module_info["items"]:
-            test_content += self._generate_item_tests(item, issues)
+            self._generate_item_tests(write, item, issue_index)
         
         # Generate integration tests
-        test_content += self._generate_integration_tests(module_info, issues)
+        write(self._generate_integration_tests(module_info, issues))
         
         # Generate regression tests for issues
-        test_content += self._generate_regression_tests(issues)
+        self._generate_regression_tests(write, issues)
         
-        return test_content
+        if out is None:
+            return "".join(parts)
+        return None
     
-    def _analyze_module(self, file_path: str, content: str) -> Dict[str, Any]:
-        """Analyze module structure"""
-        try:
-            tree = ast.parse(content)
-        except:
-            return {"items": [], "imports": [], "has_async": False}
+    def generate_test_suites(self, files: List[Tuple[str, str, List[Dict]]]) -> Dict[str, str]:
+        """Generate suites for several (file_path, content, issues) entries, in worker processes when there are enough of them"""
+        if len(files) < self.PARALLEL_MIN_FILES:
+            return {file_path: self.generate_test_suite(file_path, content, issues)
+                    for file_path, content, issues in files}
         
-        analyzer = ModuleAnalyzer()
-        analyzer.visit(tree)
+        from concurrent.futures import ProcessPoolExecutor
         
+        workers = os.cpu_count() or 1
+        chunksize = max(1, min(self.PARALLEL_BATCH_SIZE, len(files) // workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            suites = pool.map(_generate_in_worker, files, chunksize=chunksize)
+            return {file_path: suite for (file_path, _, _), suite in zip(files, suites)}
+    
+    def _analyze_module(self, file_path: str, content: str,
+                        digest: Optional[bytes] = None) -> Dict[str, Any]:
+        """Analyze module structure"""
+        module_name = Path(file_path).stem
+        analysis = _parse_and_analyze(content, digest)
+        if analysis is None:
+            return {
+                "module_name": module_name,
+                "items": [],
+                "imports": [],
+                "has_async": False,
+                "has_db": False,
+                "has_api": False,
+            }
+        
+        items, imports, has_async, has_db, has_api = analysis
         return {
-            "module_name": Path(file_path).stem,
-            "items": analyzer.items,
-            "imports": analyzer.imports,
-            "has_async": analyzer.has_async,
-            "has_db": analyzer.has_db,
-            "has_api": analyzer.has_api,
+            "module_name": module_name,
+            "items": list(items),
+            "imports": list(imports),
+            "has_async": has_async,
+            "has_db": has_db,
+            "has_api": has_api,
         }
     
     def _generate_header(self, file_path: str, module_info: Dict) -> str:
@@ -156,37 +235,48 @@ def test_user():
         
         return "\n".join(fixtures) + "\n\n"
     
-    def _generate_item_tests(self, item: Dict, issues: List[Dict]) -> str:
+    def _index_issues_by_line(self, issues: List[Dict]) -> Tuple[List[int], List[Tuple[int, Dict]]]:
+        """Sort issues by line once so each function can bisect its own range.
+        
+        Returns the sorted line numbers and the matching (original position, issue) pairs.
+        """
+        ordered = sorted(enumerate(issues), key=lambda pair: pair[1]["line"])
+        return [issue["line"] for _, issue in ordered], ordered
+    
+    def _issues_in_range(self, issue_index: Tuple[List[int], List[Tuple[int, Dict]]],
+                         line_start: int, line_end: int) -> List[Dict]:
+        """Issues reported between two lines, inclusive, in their original order"""
+        lines, ordered = issue_index
+        in_range = ordered[bisect_left(lines, line_start):bisect_right(lines, line_end)]
+        in_range.sort(key=lambda pair: pair[0])
+        return [issue for _, issue in in_range]
+    
+    def _generate_item_tests(self, write: Callable[[str], Any], item: Dict, issue_index: Tuple) -> None:
         """Generate tests for a specific function/class"""
         if item["type"] == "function":
-            return self._generate_function_tests(item, issues)
+            self._generate_function_tests(write, item, issue_index)
         elif item["type"] == "class":
-            return self._generate_class_tests(item, issues)
-        return ""
+            self._generate_class_tests(write, item, issue_index)
     
-    def _generate_function_tests(self, func: Dict, issues: List[Dict]) -> str:
+    def _generate_function_tests(self, write: Callable[[str], Any], func: Dict, issue_index: Tuple) -> None:
         """Generate tests for a function"""
-        test_class = f"\n\nclass Test{func['name'].title()}:\n"
-        test_class += f'    """Tests for {func["name"]} function"""\n\n'
-        
-        # Basic functionality test
-        test_class += self._generate_basic_test(func)
+        # Class header and basic functionality test go out as one fragment
+        write(f'\n\nclass Test{_title(func["name"])}:\n    """Tests for {func["name"]} function"""\n\n'
+              f'{self._generate_basic_test(func)}')
         
         # Edge cases
-        test_class += self._generate_edge_cases(func)
+        self._generate_edge_cases(write, func)
         
         # Error scenarios
-        test_class += self._generate_error_tests(func)
+        write(self._generate_error_tests(func))
         
         # Security tests based on issues
-        relevant_issues = [i for i in issues if func["line_start"] <= i["line"] <= func["line_end"]]
-        for issue in relevant_issues:
-            test_class += self._generate_security_test(func, issue)
-        
-        return test_class
+        for issue in self._issues_in_range(issue_index, func["line_start"], func["line_end"]):
+            write(self._generate_security_test(func, issue))
     
     def _generate_basic_test(self, func: Dict) -> str:
         """Generate basic functionality test"""
+        name = func["name"]
         if func["is_async"]:
             decorator = "    @pytest.mark.asyncio\n"
             async_def = "async "
@@ -196,13 +286,13 @@ def test_user():
             async_def = ""
             await_call = ""
         
-        return f'''{decorator}    {async_def}def test_{func["name"]}_basic_functionality(self, mock_db):
-        """Test basic functionality of {func["name"]}"""
+        return f'''{decorator}    {async_def}def test_{name}_basic_functionality(self, mock_db):
+        """Test basic functionality of {name}"""
         # Arrange
         expected = {{"success": True}}
         
         # Act
-        # result = {await_call}{func["name"]}()
+        # result = {await_call}{name}()
         
         # Assert
         # assert result == expected
@@ -210,42 +300,41 @@ def test_user():
 
 '''
     
-    def _generate_edge_cases(self, func: Dict) -> str:
+    def _generate_edge_cases(self, write: Callable[[str], Any], func: Dict) -> None:
         """Generate edge case tests"""
-        tests = ""
+        name = func["name"]
         
         # Null/None inputs
-        tests += f'''    def test_{func["name"]}_with_none_input(self):
-        """Test {func["name"]} with None input"""
+        write(f'''    def test_{name}_with_none_input(self):
+        """Test {name} with None input"""
         # Should handle None gracefully
-        # result = {func["name"]}(None)
+        # result = {name}(None)
         # assert result is None or raises appropriate exception
         pass
 
-'''
+''')
         
         # Empty inputs
-        tests += f'''    def test_{func["name"]}_with_empty_input(self):
-        """Test {func["name"]} with empty input"""
+        write(f'''    def test_{name}_with_empty_input(self):
+        """Test {name} with empty input"""
         # Test with empty string, list, dict as appropriate
-        # result = {func["name"]}("")
+        # result = {name}("")
         # assert result handles empty input correctly
         pass
 
-'''
-        
-        return tests
+''')
     
     def _generate_error_tests(self, func: Dict) -> str:
         """Generate error handling tests"""
-        return f'''    def test_{func["name"]}_error_handling(self, mock_db):
-        """Test error handling in {func["name"]}"""
+        name = func["name"]
+        return f'''    def test_{name}_error_handling(self, mock_db):
+        """Test error handling in {name}"""
         # Mock an error condition
         mock_db.execute.side_effect = Exception("Database error")
         
         # Verify proper error handling
         # with pytest.raises(ExpectedException):
-        #     {func["name"]}()
+        #     {name}()
         pass
 
 '''
@@ -261,25 +350,26 @@ def test_user():
         """Determine which test template to use"""
         if "SQL" in issue_type:
             return "sql_injection"
-        elif "auth" in issue_type.lower():
-            return "authentication"
-        elif "password" in issue_type.lower():
-            return "password_security"
-        elif "endpoint" in issue_type.lower():
-            return "api_endpoint"
+        
+        issue_type = issue_type.lower()
+        for keyword, test_type in self.TEST_TYPE_KEYWORDS:
+            if keyword in issue_type:
+                return test_type
         return "data_validation"
     
     def _sql_injection_template(self, func: Dict, issue: Dict) -> str:
         """SQL injection test template"""
-        return f'''    def test_{func["name"]}_sql_injection_vulnerability(self, mock_db):
-        """Test SQL injection vulnerability - Line {issue["line"]}"""
+        name = func["name"]
+        line = issue["line"]
+        return f'''    def test_{name}_sql_injection_vulnerability(self, mock_db):
+        """Test SQL injection vulnerability - Line {line}"""
         # WARNING: This documents current VULNERABLE behavior
         
         # Malicious input attempting SQL injection
         malicious_input = "'; DROP TABLE users; --"
         
         # Current vulnerable behavior
-        # {func["name"]}(malicious_input)
+        # {name}(malicious_input)
         
         # Check that SQL was built unsafely (current behavior)
         # called_sql = mock_db.execute.call_args[0][0]
@@ -294,20 +384,22 @@ def test_user():
     
     def _authentication_template(self, func: Dict, issue: Dict) -> str:
         """Authentication test template"""
-        return f'''    def test_{func["name"]}_missing_authentication(self, test_client):
-        """Test missing authentication - Line {issue["line"]}"""
+        name = func["name"]
+        line = issue["line"]
+        return f'''    def test_{name}_missing_authentication(self, test_client):
+        """Test missing authentication - Line {line}"""
         # Current behavior: no auth required
         
-        # response = test_client.get("/{func["name"]}")
+        # response = test_client.get("/{name}")
         # assert response.status_code == 200  # Currently allows without auth
         
         # After fix: should require authentication
-        # response = test_client.get("/{func["name"]}")
+        # response = test_client.get("/{name}")
         # assert response.status_code == 401
         
         # With valid token
         # headers = {{"Authorization": "Bearer valid_token"}}
-        # response = test_client.get("/{func["name"]}", headers=headers)
+        # response = test_client.get("/{name}", headers=headers)
         # assert response.status_code == 200
         pass
 
@@ -315,14 +407,16 @@ def test_user():
     
     def _password_security_template(self, func: Dict, issue: Dict) -> str:
         """Password security test template"""
-        return f'''    def test_{func["name"]}_password_security(self):
-        """Test password handling security - Line {issue["line"]}"""
+        name = func["name"]
+        line = issue["line"]
+        return f'''    def test_{name}_password_security(self):
+        """Test password handling security - Line {line}"""
         # Test current password handling
         
         plain_password = "test_password_123"
         
         # Current behavior (might be insecure)
-        # result = {func["name"]}(plain_password)
+        # result = {name}(plain_password)
         
         # If storing plain text (insecure):
         # assert result == plain_password  # Documents vulnerability
@@ -337,23 +431,25 @@ def test_user():
     
     def _api_endpoint_template(self, func: Dict, issue: Dict) -> str:
         """API endpoint test template"""
-        return f'''    def test_{func["name"]}_api_security(self, test_client):
-        """Test API endpoint security - Line {issue["line"]}"""
+        name = func["name"]
+        line = issue["line"]
+        return f'''    def test_{name}_api_security(self, test_client):
+        """Test API endpoint security - Line {line}"""
         # Test various security aspects
         
         # Test CORS
-        # response = test_client.options("/{func["name"]}")
+        # response = test_client.options("/{name}")
         # assert "Access-Control-Allow-Origin" in response.headers
         # assert response.headers["Access-Control-Allow-Origin"] != "*"
         
         # Test rate limiting
         # for i in range(100):
-        #     response = test_client.get("/{func["name"]}")
+        #     response = test_client.get("/{name}")
         # assert response.status_code == 429  # Too many requests
         
         # Test input validation
         # malformed_data = {{"invalid": "data"}}
-        # response = test_client.post("/{func["name"]}", json=malformed_data)
+        # response = test_client.post("/{name}", json=malformed_data)
         # assert response.status_code == 422  # Validation error
         pass
 
@@ -361,19 +457,21 @@ def test_user():
     
     def _async_function_template(self, func: Dict, issue: Dict) -> str:
         """Async function test template"""
+        name = func["name"]
+        line = issue["line"]
         return f'''    @pytest.mark.asyncio
-    async def test_{func["name"]}_async_patterns(self):
-        """Test async implementation - Line {issue["line"]}"""
+    async def test_{name}_async_patterns(self):
+        """Test async implementation - Line {line}"""
         # Test for blocking operations in async
         
         # Should not use blocking calls
         # with patch("time.sleep") as mock_sleep:
-        #     await {func["name"]}()
+        #     await {name}()
         #     mock_sleep.assert_not_called()
         
         # Should use async alternatives
         # with patch("asyncio.sleep") as mock_async_sleep:
-        #     await {func["name"]}()
+        #     await {name}()
         #     mock_async_sleep.assert_called()
         pass
 
@@ -381,34 +479,38 @@ def test_user():
     
     def _data_validation_template(self, func: Dict, issue: Dict) -> str:
         """Data validation test template"""
-        return f'''    def test_{func["name"]}_data_validation(self):
-        """Test data validation - Line {issue["line"]}"""
+        name = func["name"]
+        line = issue["line"]
+        return f'''    def test_{name}_data_validation(self):
+        """Test data validation - Line {line}"""
         # Test input validation
         
         # Invalid email format
         # with pytest.raises(ValidationError):
-        #     {func["name"]}(email="not-an-email")
+        #     {name}(email="not-an-email")
         
         # SQL injection attempt in data
         # with pytest.raises(ValidationError):
-        #     {func["name"]}(name="'; DROP TABLE--")
+        #     {name}(name="'; DROP TABLE--")
         
         # XSS attempt
         # with pytest.raises(ValidationError):
-        #     {func["name"]}(comment="<script>alert('xss')</script>")
+        #     {name}(comment="<script>alert('xss')</script>")
         pass
 
 '''
     
     def _error_handling_template(self, func: Dict, issue: Dict) -> str:
         """Error handling test template"""
-        return f'''    def test_{func["name"]}_error_handling_security(self):
-        """Test secure error handling - Line {issue["line"]}"""
+        name = func["name"]
+        line = issue["line"]
+        return f'''    def test_{name}_error_handling_security(self):
+        """Test secure error handling - Line {line}"""
         # Ensure errors don't leak sensitive info
         
         # Trigger an error
         # with pytest.raises(Exception) as exc_info:
-        #     {func["name"]}(invalid_param=True)
+        #     {name}(invalid_param=True)
         
         # Error should not contain sensitive info
         # error_message = str(exc_info.value)
@@ -419,25 +521,25 @@ def test_user():
 
 '''
     
-    def _generate_class_tests(self, cls: Dict, issues: List[Dict]) -> str:
+    def _generate_class_tests(self, write: Callable[[str], Any], cls: Dict, issue_index: Tuple) -> None:
         """Generate tests for a class"""
-        test_content = f"\n\nclass Test{cls['name']}:\n"
-        test_content += f'    """Tests for {cls["name"]} class"""\n\n'
-        
-        # Test initialization
-        test_content += f'''    def test_{cls["name"].lower()}_initialization(self):
+        # Class header and initialization test go out as one fragment
+        write(f'''
+
+class Test{cls["name"]}:
+    """Tests for {cls["name"]} class"""
+
+    def test_{cls["name"].lower()}_initialization(self):
         """Test {cls["name"]} initialization"""
         # instance = {cls["name"]}()
         # assert instance is not None
         pass
 
-'''
+''')
         
         # Test each method
         for method in cls.get("methods", []):
-            test_content += self._generate_function_tests(method, issues)
-        
-        return test_content
+            self._generate_function_tests(write, method, issue_index)
     
     def _generate_integration_tests(self, module_info: Dict, issues: List[Dict]) -> str:
         """Generate integration tests"""
@@ -463,50 +565,57 @@ class TestIntegration:
         pass
 '''
     
-    def _generate_regression_tests(self, issues: List[Dict]) -> str:
+    def _generate_regression_tests(self, write: Callable[[str], Any], issues: List[Dict]) -> None:
         """Generate regression tests for found issues"""
         if not issues:
-            return ""
+            return
         
-        content = '''
+        write('''
 
 class TestSecurityRegressions:
     """Regression tests for security issues"""
     
-'''
+''')
         
         # Group issues by type
-        issue_groups = {}
+        issue_groups = defaultdict(list)
         for issue in issues:
-            issue_type = issue["type"]
-            if issue_type not in issue_groups:
-                issue_groups[issue_type] = []
-            issue_groups[issue_type].append(issue)
+            issue_groups[issue["type"]].append(issue)
         
         # Generate test for each issue type
         for issue_type, type_issues in issue_groups.items():
-            safe_name = re.sub(r'[^a-zA-Z0-9_]', '_', issue_type.lower())
-            content += f'''    def test_regression_{safe_name}(self):
+            safe_name = _slug(issue_type)
+            write(f'''    def test_regression_{safe_name}(self):
         """Regression test for {issue_type}"""
         # Verify that {len(type_issues)} instances of {issue_type} are fixed
         
         # Test cases that previously failed:
-'''
+''')
             
-            for i, issue in enumerate(type_issues[:3]):  # First 3 examples
-                content += f'''        # Case {i+1}: Line {issue["line"]}
+            for case, issue in enumerate(islice(type_issues, 3), 1):  # First 3 examples
+                write(f'''        # Case {case}: Line {issue["line"]}
         # Previous vulnerable code: {issue.get("code", "N/A")[:50]}...
         # Should now: {issue.get("fix", "be secure")[:50]}...
         
-'''
+''')
             
-            content += "        pass\n\n"
-        
-        return content
+            write("        pass\n\n")
+
 
+def _dec_name(decorator: ast.expr) -> str:
+    """Readable name of a decorator: the name itself, the callee of a call, or its source"""
+    if type(decorator) is ast.Name:
+        return decorator.id
+    if type(decorator) is ast.Call:
+        decorator = decorator.func
+    return ast.unparse(decorator)
 
-class ModuleAnalyzer(ast.NodeVisitor):
-    """AST visitor to analyze module structure"""
+
+class ModuleAnalyzer:
+    """Single-pass AST walk that collects the module structure"""
+    
+    # Fields holding nested statements, in ast field order (try handlers and match cases hold bodies)
+    STATEMENT_FIELDS = ("body", "handlers", "orelse", "finalbody", "cases")
     
     def __init__(self):
         self.items = []
@@ -516,45 +625,73 @@ class ModuleAnalyzer(ast.NodeVisitor):
         self.has_api = False
         self.current_class = None
     
-    def visit_Import(self, node):
+    def walk(self, node):
+        """Visit node and its nested statements, dispatching on the exact node type"""
+        track = self.TRACKERS.get(type(node))
+        if track is None:
+            self._walk_statements(node)
+        else:
+            track(self, node)
+    
+    def _walk_statements(self, node):
+        """Recurse into the statement lists of node only.
+        
+        Functions, classes and imports are statements, and expressions never
+        contain statements, so expression subtrees are skipped entirely.
+        """
+        trackers = self.TRACKERS
+        for field in self.STATEMENT_FIELDS:
+            for child in getattr(node, field, ()):
+                track = trackers.get(type(child))
+                if track is None:
+                    self._walk_statements(child)
+                else:
+                    track(self, child)
+    
+    def _track_import(self, node):
         """Track imports"""
+        # Module names repeat across files and key the _import_kind cache, so they are interned
+        add_import = self.imports.append
         for alias in node.names:
-            self.imports.append(alias.name)
-            self._check_import_type(alias.name)
-        self.generic_visit(node)
+            module = sys.intern(alias.name)
+            add_import(module)
+            self._check_import_type(module)
     
-    def visit_ImportFrom(self, node):
+    def _track_import_from(self, node):
         """Track from imports"""
         if node.module:
-            self.imports.append(node.module)
-            self._check_import_type(node.module)
-        self.generic_visit(node)
+            module = sys.intern(node.module)
+            self.imports.append(module)
+            self._check_import_type(module)
     
-    def visit_ClassDef(self, node):
-        """Track classes"""
+    def _track_class(self, node):
+        """Track classes and the methods in their body"""
         cls_info = {
             "type": "class",
             "name": node.name,
             "line_start": node.lineno,
             "line_end": node.end_lineno or node.lineno,
             "methods": [],
-            "decorators": [d.id if hasattr(d, 'id') else str(d) for d in node.decorator_list]
+            "decorators": [_dec_name(d) for d in node.decorator_list]
         }
         
         self.current_class = cls_info
         self.items.append(cls_info)
-        self.generic_visit(node)
+        self._walk_statements(node)
         self.current_class = None
     
-    def visit_FunctionDef(self, node):
-        """Track functions"""
+    def _track_function(self, node, is_async: bool = False):
+        """Track functions and async functions"""
+        if is_async:
+            self.has_async = True
+        
         func_info = {
             "type": "function",
             "name": node.name,
             "line_start": node.lineno,
             "line_end": node.end_lineno or node.lineno,
-            "is_async": False,
-            "decorators": [d.id if hasattr(d, 'id') else str(d) for d in node.decorator_list],
+            "is_async": is_async,
+            "decorators": [_dec_name(d) for d in node.decorator_list],
             "args": [arg.arg for arg in node.args.args]
         }
         
@@ -562,43 +699,107 @@ class ModuleAnalyzer(ast.NodeVisitor):
             self.current_class["methods"].append(func_info)
         else:
             self.items.append(func_info)
-        
-        self.generic_visit(node)
+        self._walk_statements(node)
     
-    def visit_AsyncFunctionDef(self, node):
+    def _track_async_function(self, node):
         """Track async functions"""
-        self.has_async = True
-        func_info = {
-            "type": "function",
-            "name": node.name,
-            "line_start": node.lineno,
-            "line_end": node.end_lineno or node.lineno,
-            "is_async": True,
-            "decorators": [d.id if hasattr(d, 'id') else str(d) for d in node.decorator_list],
-            "args": [arg.arg for arg in node.args.args]
-        }
-        
-        if self.current_class:
-            self.current_class["methods"].append(func_info)
-        else:
-            self.items.append(func_info)
-        
-        self.generic_visit(node)
+        self._track_function(node, is_async=True)
     
     def _check_import_type(self, module: str):
         """Check import types for test generation"""
-        if any(db in module for db in ['sqlalchemy', 'database', 'db']):
+        is_db, is_api, is_async = _import_kind(module)
+        if is_db:
             self.has_db = True
-        if any(api in module for api in ['fastapi', 'starlette', 'api']):
+        if is_api:
             self.has_api = True
-        if 'async' in module:
+        if is_async:
             self.has_async = True
+    
+    # One dict lookup per statement picks its tracker; other statements are only descended into
+    TRACKERS = {
+        ast.FunctionDef: _track_function,
+        ast.AsyncFunctionDef: _track_async_function,
+        ast.ClassDef: _track_class,
+        ast.Import: _track_import,
+        ast.ImportFrom: _track_import_from,
+    }
+
+
+# Substrings that mark an imported module as database, API or async related.
+# Matched anywhere in the dotted name, so local packages such as app.db count too.
+DB_IMPORT_MARKERS = ('sqlalchemy', 'database', 'db')
+API_IMPORT_MARKERS = ('fastapi', 'starlette', 'api')
+
+
+@lru_cache(maxsize=1024)
+def _import_kind(module: str) -> Tuple[bool, bool, bool]:
+    """Whether a module name looks database, API and async related"""
+    return (
+        any(marker in module for marker in DB_IMPORT_MARKERS),
+        any(marker in module for marker in API_IMPORT_MARKERS),
+        'async' in module,
+    )
+
+
+def _freeze_item(item: Dict[str, Any]) -> MappingProxyType:
+    """Read-only view of an analyzed item, safe to share between cached results"""
+    if "methods" in item:
+        item["methods"] = tuple(_freeze_item(method) for method in item["methods"])
+    return MappingProxyType(item)
+
+
+def content_digest(data: bytes) -> bytes:
+    """Cache key of a source file's raw bytes"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+# Module analyses keyed by content digest, least recently used first
+ANALYSIS_CACHE_SIZE = 256
+_analysis_cache: "OrderedDict[bytes, Optional[Tuple]]" = OrderedDict()
+
+
+def _parse_and_analyze(content: str, digest: Optional[bytes] = None) -> Optional[Tuple]:
+    """Parse and analyze source once per distinct content.
+    
+    Regenerating tests for an unchanged file skips ast.parse and the walk.
+    The cache holds 16-byte digests rather than the sources themselves.
+    Items are returned as read-only mappings because every caller shares them.
+    """
+    if digest is None:
+        digest = content_digest(content.encode('utf-8', 'surrogatepass'))
+    
+    if digest in _analysis_cache:
+        _analysis_cache.move_to_end(digest)
+        return _analysis_cache[digest]
+    
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        analysis = None
+    else:
+        analyzer = ModuleAnalyzer()
+        analyzer.walk(tree)
+        analysis = (
+            tuple(_freeze_item(item) for item in analyzer.items),
+            tuple(analyzer.imports),
+            analyzer.has_async,
+            analyzer.has_db,
+            analyzer.has_api,
+        )
+    
+    _analysis_cache[digest] = analysis
+    if len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+        _analysis_cache.popitem(last=False)
+    return analysis
+
+
+def _generate_in_worker(entry: Tuple[str, str, List[Dict]]) -> str:
+    file_path, content, issues = entry
+    return TestGenerator().generate_test_suite(file_path, content, issues)
 
 
 def main():
     """CLI interface for test generator"""
-    import sys
-    import os
     import glob
     
     # If no file provided, find recent Python files
@@ -616,17 +817,15 @@ def main():
     else:
         file_path = sys.argv[1]
     
-    # Read file content
+    # Read file content once as bytes: decoded for parsing, hashed for the analysis cache
     try:
-        with open(file_path, 'r') as f:
-            content = f.read()
+        data = Path(file_path).read_bytes()
     except FileNotFoundError:
         print(f"Error: File {file_path} not found")
         sys.exit(1)
+    content = data.decode('utf-8')
     
-    # Generate tests
     generator = TestGenerator()
-    test_content = generator.generate_test_suite(file_path, content, [])
     
     # Create test directory if it doesn't exist
     test_dir = Path("tests/guardian_generated")
@@ -634,8 +833,16 @@ def main():
     
     # Output test file in the correct directory
     test_file = test_dir / f"test_{Path(file_path).stem}_generated.py"
-    with open(test_file, 'w') as f:
-        f.write(test_content)
+    
+    # Generate tests straight into a temporary file, replaced into place once complete
+    tmp_file = test_file.with_name(test_file.name + ".tmp")
+    try:
+        with open(tmp_file, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+            generator.generate_test_suite(file_path, content, [], out=f, digest=content_digest(data))
+        os.replace(tmp_file, test_file)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
     
     print(f"✅ Tests generated: {test_file}")
 
@@ -15,31 +15,281 @@ from pathlib import Path
 from typing import Dict, List, Tuple, Optional, Any, Set
 import ast
 import hashlib
+import io
 import subprocess
+from array import array
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Optional: Hyperscan scans all line rules in one pass over the file
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Parsed configs by (path, mtime), and directories already created by this process
+_config_cache: Dict[Tuple[str, float], Dict[str, Any]] = {}
+_ready_dirs: Set[str] = set()
+
+# Backups already on disk, per backup dir: "_<digest>_<file name>" -> path
+_backup_index: Dict[str, Dict[str, Path]] = {}
+BACKUP_NAME_PATTERN = re.compile(r'\d{8}_\d{6}(_[0-9a-f]{16}_.+)$')
+
+
+def _ensure_dir(path: Path) -> Path:
+    """Create path (and parents) the first time this process asks for it"""
+    key = os.path.abspath(path)
+    if key not in _ready_dirs:
+        path.mkdir(parents=True, exist_ok=True)
+        _ready_dirs.add(key)
+    return path
+
+
+def _output_name(file_path: str) -> str:
+    """File stem plus a short hash of its absolute path, so same-named files get separate outputs"""
+    path_hash = hashlib.blake2b(os.path.abspath(file_path).encode(), digest_size=4).hexdigest()
+    return f"{Path(file_path).stem}_{path_hash}"
+
+
+# Patterns used to build suggested fixes
+SQL_STRING_PATTERN = re.compile(r'["\']([^"\']+)["\']')
+SQL_PARAM_PATTERN = re.compile(r'{(\w+)}')
+ENV_ASSIGN_PATTERN = re.compile(r'(\w+)\s*=\s*["\']([^"\']+)["\']')
+
+# Fields of a node that hold nested statements (try handlers and match cases hold bodies)
+STATEMENT_FIELDS = ("body", "handlers", "orelse", "finalbody", "cases")
+
+
+def iter_statements(tree: ast.AST):
+    """
+    Yield every statement nested in tree. Imports, functions and classes are
+    statements and expressions never contain statements, so expression
+    subtrees are not visited.
+    """
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for field in STATEMENT_FIELDS:
+            children = getattr(node, field, ())
+            for child in children:
+                if isinstance(child, ast.stmt):
+                    yield child
+            stack.extend(reversed(children))
+
+
+@lru_cache(maxsize=256)
+def _find_importers(module_name: str, root: str) -> Tuple[str, ...]:
+    """Python files under root whose imports mention module_name.
+    
+    One ripgrep (or git grep) run searches the whole tree; results are cached
+    per module and root for the life of the process. Returns nothing when
+    neither tool is available or the search times out.
+    """
+    pattern = rf'\b(from|import)\b.*\b{re.escape(module_name)}\b'
+    commands = (
+        ['rg', '-l', '--type=py', pattern, '.'],
+        ['git', 'grep', '-l', '-E', pattern, '--', '*.py'],
+    )
+    for command in commands:
+        try:
+            result = subprocess.run(command, cwd=root, capture_output=True, text=True, timeout=5)
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            continue
+        # 0: matches, 1: no match; anything else (not a repo, bad pattern) tries the next tool
+        if result.returncode in (0, 1):
+            return tuple(path[2:] if path.startswith('./') else path
+                         for path in result.stdout.splitlines())
+    return ()
+
+
+# Fixes depend only on the line, and the same vulnerable idiom tends to recur
+@lru_cache(maxsize=2048)
+def _sql_fix(line: str) -> str:
+    """Generate safe SQL fix"""
+    # Extract the query pattern
+    if 'execute' in line or 'query' in line:
+        # Try to extract the SQL
+        sql_match = SQL_STRING_PATTERN.search(line)
+        if sql_match:
+            sql = sql_match.group(1)
+            # Replace variables with parameters
+            params = SQL_PARAM_PATTERN.findall(sql)
+            if params:
+                safe_sql = sql
+                for param in params:
+                    safe_sql = safe_sql.replace(f'{{{param}}}', f':{param}')
+                param_dict = ", ".join(f'"{p}": {p}' for p in params)
+                return f'text("{safe_sql}"), {{{param_dict}}}'
+    return "Use parameterized queries with text() and bind parameters"
+
+
+@lru_cache(maxsize=2048)
+def _env_fix(line: str) -> str:
+    """Generate environment variable fix"""
+    # Extract variable name
+    var_match = ENV_ASSIGN_PATTERN.search(line)
+    if var_match:
+        var_name = var_match.group(1).upper()
+        return f'{var_match.group(1)} = os.getenv("{var_name}")'
+    return "Use os.getenv() or settings from pydantic-settings"
+
+
+@dataclass(slots=True, frozen=True)
+class ProductionIssue:
+    """A security issue found in production code"""
+    severity: str
+    line: int
+    type: str
+    code: str
+    fix: str
+    tests_needed: Tuple[str, ...]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict form, for serializing an issue"""
+        return {
+            "severity": self.severity,
+            "line": self.line,
+            "type": self.type,
+            "code": self.code,
+            "fix": self.fix,
+            "tests_needed": list(self.tests_needed)
+        }
+
 
 class ProductionCodeAnalyzer:
     """Analyzes production code for security issues"""
     
+    # Line prefixes of comments and docstrings, which the SQL rules ignore
+    NON_CODE_PREFIXES = ('#', '"""', "'''")
+    
+    # Patterns are compiled once and shared by every analyzer instance
+    SQL_PATTERNS = [
+        (re.compile(r'(execute|query)\s*\(\s*f["\'].*{.*}.*["\']', re.IGNORECASE), "SQL Injection via f-string", "CRITICAL"),
+        (re.compile(r'(execute|query)\s*\(\s*["\'].*["\'].*\+', re.IGNORECASE), "SQL Injection via concatenation", "CRITICAL"),
+        (re.compile(r'(execute|query)\s*\(\s*["\'].*{}.*["\']\s*\.format', re.IGNORECASE), "SQL Injection via .format()", "CRITICAL"),
+        (re.compile(r'(execute|query)\s*\(\s*["\'].*%s.*["\'].*%', re.IGNORECASE), "SQL Injection via % formatting", "CRITICAL"),
+        (re.compile(r'(SELECT|INSERT|UPDATE|DELETE).*\+\s*\w+', re.IGNORECASE), "Direct variable in SQL query", "HIGH"),
+    ]
+    
+    SECRET_PATTERNS = [
+        (re.compile(r'(password|passwd|pwd)\s*=\s*["\'][^"\']+["\']', re.IGNORECASE), "Hardcoded password", "CRITICAL"),
+        (re.compile(r'(api_key|apikey|api_secret)\s*=\s*["\'][^"\']+["\']', re.IGNORECASE), "Hardcoded API key", "CRITICAL"),
+        (re.compile(r'(secret_key|secret)\s*=\s*["\'][^"\']+["\']', re.IGNORECASE), "Hardcoded secret", "CRITICAL"),
+        (re.compile(r'postgresql://[^@]+:[^@]+@', re.IGNORECASE), "Hardcoded database credentials", "CRITICAL"),
+    ]
+    
+    ENDPOINT_PATTERN = re.compile(r'@(app|router)\.(get|post|put|delete|patch)')
+    ROUTE_OWNERS = {'app', 'router'}
+    ROUTE_METHODS = {'get', 'post', 'put', 'delete', 'patch'}
+    AUTH_DECORATORS = ['Depends', 'Security', 'HTTPBearer', 'OAuth2']
+    PUBLIC_ENDPOINTS = ['health', 'docs', 'openapi', 'metrics', 'root']
+    
+    MODEL_NAME_PATTERN = re.compile(r'class\s+(\w+)')
+    SENSITIVE_FIELDS = ['password', 'email', 'cpf', 'credit_card', 'phone', 'ssn', 'token']
+    
+    AUTH_PATTERNS = [
+        (re.compile(r'jwt\.encode.*secret\s*=\s*["\'][^"\']{1,10}["\']', re.IGNORECASE), "Weak JWT secret", "CRITICAL"),
+        (re.compile(r'verify_password.*==', re.IGNORECASE), "Timing attack vulnerability", "HIGH"),
+        (re.compile(r'md5|sha1', re.IGNORECASE), "Weak hashing algorithm", "HIGH"),
+    ]
+    AUTH_FIXES = {
+        "Weak JWT secret": "Use strong secret from environment: os.getenv('JWT_SECRET')",
+        "Timing attack vulnerability": "Use secrets.compare_digest() for secure comparison",
+        "Weak hashing algorithm": "Use bcrypt or argon2 for password hashing"
+    }
+    
+    # Literals (lowercase) at least one of which every rule of a category needs
+    PREFILTERS = {
+        'sql': ('execute', 'query', 'select', 'insert', 'update', 'delete'),
+        'secret': ('=', 'postgresql://'),
+        'auth': ('jwt', 'verify_password', 'md5', 'sha1'),
+        'log': ('log', 'print'),
+    }
+    PREFILTER_WORDS = tuple(word for words in PREFILTERS.values() for word in words)
+    
+    # (database, category per pattern id) built on first use, False if Hyperscan can't compile them
+    _hyperscan_db = None
+    
+    NEWLINE_PATTERN = re.compile(r'\n')
+    ASYNC_PATTERNS = [
+        (re.compile(r'async def.*\n.*time\.sleep', re.IGNORECASE), "Blocking sleep in async", "MEDIUM"),
+        (re.compile(r'async def.*\n.*requests\.(get|post)', re.IGNORECASE), "Sync HTTP in async", "MEDIUM"),
+    ]
+    
+    LOG_PATTERNS = [
+        (re.compile(r'(log|print).*password', re.IGNORECASE), "Password in logs", "HIGH"),
+        (re.compile(r'(log|print).*token', re.IGNORECASE), "Token in logs", "HIGH"),
+        (re.compile(r'(log|print).*credit_card', re.IGNORECASE), "Credit card in logs", "CRITICAL"),
+    ]
+    
+    # Union of every single-line rule: lines it rejects skip all per-rule searches.
+    # It is lowercased and run on the lowercased line, which is much cheaper than
+    # re.IGNORECASE over an alternation (the rules have no uppercase escapes).
+    LINE_UNION = re.compile('|'.join(
+        f'(?:{pattern.pattern.lower()})'
+        for rules in (SQL_PATTERNS, SECRET_PATTERNS, AUTH_PATTERNS, LOG_PATTERNS)
+        for pattern, _, _ in rules
+    ))
+    
+    # Tests each kind of issue needs; one shared tuple per kind
+    TESTS_NEEDED = {
+        "sql": ("sql_injection", "parameterized_query", "edge_cases"),
+        "secret": ("env_loading", "secret_masking", "config_validation"),
+        "endpoint": ("auth_required", "unauthorized_access", "token_validation"),
+        "model": ("secret_masking", "serialization_check", "no_plain_text"),
+        "auth": ("crypto_strength", "timing_safety", "token_expiry"),
+        "async": ("async_performance", "non_blocking", "concurrency"),
+        "log": ("log_masking", "no_sensitive_data", "audit_compliance"),
+    }
+    
+    IMPORT_PATTERN = re.compile(r'from\s+(\S+)\s+import|import\s+(\S+)')
+    FUNCTION_NAME_PATTERN = re.compile(r'def\s+(\w+)')
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.issues: List[Dict[str, Any]] = []
+        self.issues: List[ProductionIssue] = []
         self.dependencies: Set[str] = set()
         self.impact_analysis: Dict[str, Any] = {}
+        self.severity_counts: Counter = Counter()
+        # The importer search spawns rg/git grep, so single-file hook runs skip it
+        self.find_importers = False
         
-    def analyze(self, file_path: str, content: str) -> Tuple[List[Dict], Dict]:
+    def analyze(self, file_path: str, content: str) -> Tuple[List[ProductionIssue], Dict]:
         """Analyze production code and return issues + impact analysis"""
+        # Results of a previous file must not leak into this one
+        self.issues = []
+        self.dependencies = set()
+        self.impact_analysis = {}
+        
         self.file_path = file_path
         self.content = content
         self.lines = content.split('\n')
+        # Offset of each line start, so whole-content matches map back to line numbers.
+        # A typed array stores 8 bytes per line instead of an int object and a pointer.
+        self._line_starts = array('q', [0])
+        self._line_starts.extend(m.end() for m in self.NEWLINE_PATTERN.finditer(content))
+        
+        # Parsed once for the structural checks; None when the code does not parse
+        try:
+            self.tree: Optional[ast.Module] = ast.parse(content)
+        except (SyntaxError, ValueError):
+            self.tree = None
         
-        # Run security checks (same as Guardian but for audit)
-        self._check_sql_security()
-        self._check_hardcoded_secrets()
+        # Run security checks (same as Guardian but for audit).
+        # Single-line rules share one pass; issues keep the per-check order.
+        sql_issues, secret_issues, auth_issues, log_issues = self._scan_lines()
+        self.issues.extend(sql_issues)
+        self.issues.extend(secret_issues)
         self._check_fastapi_security()
         self._check_pydantic_security()
-        self._check_authentication()
+        self.issues.extend(auth_issues)
         self._check_async_patterns()
-        self._check_data_protection()
+        self.issues.extend(log_issues)
+        
+        # Severity histogram shared by the risk level and the migration plan
+        self.severity_counts = Counter(issue.severity for issue in self.issues)
         
         # Analyze dependencies and impact
         self._analyze_dependencies()
@@ -47,232 +297,406 @@ class ProductionCodeAnalyzer:
         
         return self.issues, self.impact_analysis
     
-    def _check_sql_security(self):
-        """Check for SQL injection vulnerabilities in production code"""
-        sql_patterns = [
-            (r'(execute|query)\s*\(\s*f["\'].*{.*}.*["\']', "SQL Injection via f-string", "CRITICAL"),
-            (r'(execute|query)\s*\(\s*["\'].*["\'].*\+', "SQL Injection via concatenation", "CRITICAL"),
-            (r'(execute|query)\s*\(\s*["\'].*{}.*["\']\s*\.format', "SQL Injection via .format()", "CRITICAL"),
-            (r'(execute|query)\s*\(\s*["\'].*%s.*["\'].*%', "SQL Injection via % formatting", "CRITICAL"),
-            (r'(SELECT|INSERT|UPDATE|DELETE).*\+\s*\w+', "Direct variable in SQL query", "HIGH"),
-        ]
+    def _scan_lines(self) -> Tuple[List[ProductionIssue], List[ProductionIssue],
+                                   List[ProductionIssue], List[ProductionIssue]]:
+        """Run every single-line rule in one pass over the file.
         
-        for i, line in enumerate(self.lines, 1):
-            for pattern, issue_type, severity in sql_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    if line.strip().startswith('#') or line.strip().startswith('"""'):
-                        continue
-                        
-                    self.issues.append({
-                        "severity": severity,
-                        "line": i,
-                        "type": issue_type,
-                        "code": line.strip(),
-                        "fix": self._generate_sql_fix(line),
-                        "tests_needed": ["sql_injection", "parameterized_query", "edge_cases"]
-                    })
-    
-    def _generate_sql_fix(self, line: str) -> str:
-        """Generate safe SQL fix"""
-        # Extract the query pattern
-        if 'execute' in line or 'query' in line:
-            # Try to extract the SQL
-            sql_match = re.search(r'["\']([^"\']+)["\']', line)
-            if sql_match:
-                sql = sql_match.group(1)
-                # Replace variables with parameters
-                params = re.findall(r'{(\w+)}', sql)
-                if params:
-                    safe_sql = sql
-                    for param in params:
-                        safe_sql = safe_sql.replace(f'{{{param}}}', f':{param}')
-                    param_dict = ", ".join(f'"{p}": {p}' for p in params)
-                    return f'text("{safe_sql}"), {{{param_dict}}}'
-        return "Use parameterized queries with text() and bind parameters"
-    
-    def _check_hardcoded_secrets(self):
-        """Check for hardcoded secrets in production"""
-        secret_patterns = [
-            (r'(password|passwd|pwd)\s*=\s*["\'][^"\']+["\']', "Hardcoded password", "CRITICAL"),
-            (r'(api_key|apikey|api_secret)\s*=\s*["\'][^"\']+["\']', "Hardcoded API key", "CRITICAL"),
-            (r'(secret_key|secret)\s*=\s*["\'][^"\']+["\']', "Hardcoded secret", "CRITICAL"),
-            (r'postgresql://[^@]+:[^@]+@', "Hardcoded database credentials", "CRITICAL"),
-        ]
+        A line that the combined LINE_UNION regex rejects cannot match any
+        individual rule, and neither can a line without any PREFILTERS literal,
+        which is cheaper still to test. Lines that pass only run the
+        categories whose literals they contain. With Hyperscan installed, the
+        per-category candidate lines of one scan replace both filters.
+        Non-ASCII lines skip the filters, since Unicode case folding is not
+        the same as lower().
+        
+        Lowering each line once is deliberate: lower() plus the literal and
+        lowercase union checks costs about a fifth of an IGNORECASE union on
+        the raw line, which is itself slower than trying each rule in turn.
+        """
+        sql_issues: List[ProductionIssue] = []
+        secret_issues: List[ProductionIssue] = []
+        auth_issues: List[ProductionIssue] = []
+        log_issues: List[ProductionIssue] = []
+        matches_any_rule = self.LINE_UNION.search
+        any_words = self.PREFILTER_WORDS
+        sql_words, secret_words, auth_words, log_words = (
+            self.PREFILTERS[category] for category in ('sql', 'secret', 'auth', 'log'))
+        candidates = self._hyperscan_candidates()
         
         for i, line in enumerate(self.lines, 1):
-            if 'os.getenv' in line or 'os.environ' in line or '= settings.' in line:
+            if not line.isascii():
+                self._check_sql_security(i, line, sql_issues)
+                self._check_hardcoded_secrets(i, line, secret_issues)
+                self._check_authentication(i, line, auth_issues)
+                self._check_data_protection(i, line, log_issues)
                 continue
-                
-            for pattern, issue_type, severity in secret_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    self.issues.append({
-                        "severity": severity,
-                        "line": i,
-                        "type": issue_type,
-                        "code": line.strip(),
-                        "fix": self._generate_env_fix(line),
-                        "tests_needed": ["env_loading", "secret_masking", "config_validation"]
-                    })
-    
-    def _generate_env_fix(self, line: str) -> str:
-        """Generate environment variable fix"""
-        # Extract variable name
-        var_match = re.search(r'(\w+)\s*=\s*["\']([^"\']+)["\']', line)
-        if var_match:
-            var_name = var_match.group(1).upper()
-            return f'{var_match.group(1)} = os.getenv("{var_name}")'
-        return "Use os.getenv() or settings from pydantic-settings"
+            
+            if candidates is not None:
+                if i in candidates["sql"]:
+                    self._check_sql_security(i, line, sql_issues)
+                if i in candidates["secret"]:
+                    self._check_hardcoded_secrets(i, line, secret_issues)
+                if i in candidates["auth"]:
+                    self._check_authentication(i, line, auth_issues)
+                if i in candidates["log"]:
+                    self._check_data_protection(i, line, log_issues)
+                continue
+            
+            low = line.lower()
+            if not any(word in low for word in any_words) or matches_any_rule(low) is None:
+                continue
+            if any(word in low for word in sql_words):
+                self._check_sql_security(i, line, sql_issues)
+            if any(word in low for word in secret_words):
+                self._check_hardcoded_secrets(i, line, secret_issues)
+            if any(word in low for word in auth_words):
+                self._check_authentication(i, line, auth_issues)
+            if any(word in low for word in log_words):
+                self._check_data_protection(i, line, log_issues)
+        
+        return sql_issues, secret_issues, auth_issues, log_issues
+    
+    @classmethod
+    def _get_hyperscan_db(cls):
+        """Compile every single-line rule into a single Hyperscan database, once per process"""
+        if hyperscan is None:
+            return None
+        
+        if cls._hyperscan_db is None:
+            expressions = []
+            categories = []
+            for category, rules in (("sql", cls.SQL_PATTERNS), ("secret", cls.SECRET_PATTERNS),
+                                    ("auth", cls.AUTH_PATTERNS), ("log", cls.LOG_PATTERNS)):
+                for pattern, _, _ in rules:
+                    expressions.append(pattern.pattern.encode())
+                    categories.append(category)
+            
+            db = hyperscan.Database()
+            try:
+                db.compile(
+                    expressions=expressions,
+                    ids=list(range(len(expressions))),
+                    elements=len(expressions),
+                    flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST] * len(expressions),
+                )
+                cls._hyperscan_db = (db, categories)
+            except hyperscan.error:
+                # Fall back to the literal and LINE_UNION filters
+                cls._hyperscan_db = False
+        
+        return cls._hyperscan_db or None
+    
+    def _hyperscan_candidates(self) -> Optional[Dict[str, Set[int]]]:
+        """Scan the whole file once and return, per category, the line numbers with a match"""
+        compiled = self._get_hyperscan_db()
+        if compiled is None:
+            return None
+        
+        db, categories = compiled
+        data = self.content.encode('utf-8', errors='replace')
+        
+        # Hyperscan reports byte offsets
+        if self.content.isascii():
+            line_starts = self._line_starts
+        else:
+            line_starts = array('q', [0])
+            line_starts.extend(m.end() for m in re.finditer(rb'\n', data))
+        
+        candidates: Dict[str, Set[int]] = {category: set() for category in self.PREFILTERS}
+        
+        def on_match(pattern_id, start, end, flags, context):
+            # \s can cross a newline here but not in the per-line rules: mark every line spanned
+            first = bisect_right(line_starts, start)
+            last = bisect_right(line_starts, max(start, end - 1))
+            candidates[categories[pattern_id]].update(range(first, last + 1))
+        
+        db.scan(data, match_event_handler=on_match)
+        return candidates
+    
+    def _check_sql_security(self, i: int, line: str, issues: List[ProductionIssue]):
+        """Check a line for SQL injection vulnerabilities in production code"""
+        # Comments and docstring lines are skipped before any regex runs
+        stripped = line.strip()
+        if stripped.startswith(self.NON_CODE_PREFIXES):
+            return
+        
+        for pattern, issue_type, severity in self.SQL_PATTERNS:
+            if pattern.search(line):
+                issues.append(ProductionIssue(
+                    severity=severity,
+                    line=i,
+                    type=issue_type,
+                    code=stripped,
+                    fix=_sql_fix(line),
+                    tests_needed=self.TESTS_NEEDED["sql"]
+                ))
+    
+    def _check_hardcoded_secrets(self, i: int, line: str, issues: List[ProductionIssue]):
+        """Check a line for hardcoded secrets in production"""
+        if 'os.getenv' in line or 'os.environ' in line or '= settings.' in line:
+            return
+            
+        for pattern, issue_type, severity in self.SECRET_PATTERNS:
+            if pattern.search(line):
+                issues.append(ProductionIssue(
+                    severity=severity,
+                    line=i,
+                    type=issue_type,
+                    code=line.strip(),
+                    fix=_env_fix(line),
+                    tests_needed=self.TESTS_NEEDED["secret"]
+                ))
     
     def _check_fastapi_security(self):
         """Check FastAPI security in production"""
-        auth_decorators = ['Depends', 'Security', 'HTTPBearer', 'OAuth2']
-        endpoint_pattern = r'@(app|router)\.(get|post|put|delete|patch)'
+        if self.tree is None:
+            self._check_fastapi_security_by_lines()
+            return
         
+        # Files that never touch app/router cannot declare endpoints
+        if 'app.' not in self.content and 'router.' not in self.content:
+            return
+        
+        endpoints = []
+        for node in iter_statements(self.tree):
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            route = next((d for d in node.decorator_list if self._is_route_decorator(d)), None)
+            if route is None or node.name in self.PUBLIC_ENDPOINTS:
+                continue
+            
+            # Auth may come from a parameter default or annotation, or from route dependencies
+            auth_sources = [route, *node.args.defaults, *node.args.kw_defaults,
+                            *(arg.annotation for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs)]
+            if not any(self._mentions_auth(source) for source in auth_sources if source is not None):
+                endpoints.append(route.lineno)
+        
+        for line in sorted(endpoints):
+            self.issues.append(ProductionIssue(
+                severity="HIGH",
+                line=line,
+                type="Missing authentication",
+                code=self._line_at(line).strip(),
+                fix="Add Depends(get_current_user) to function parameters",
+                tests_needed=self.TESTS_NEEDED["endpoint"]
+            ))
+    
+    def _is_route_decorator(self, decorator: ast.expr) -> bool:
+        """Whether a decorator is @app.<method>(...) or @router.<method>(...)"""
+        target = decorator.func if isinstance(decorator, ast.Call) else decorator
+        return (isinstance(target, ast.Attribute)
+                and target.attr in self.ROUTE_METHODS
+                and isinstance(target.value, ast.Name)
+                and target.value.id in self.ROUTE_OWNERS)
+    
+    def _mentions_auth(self, node: ast.AST) -> bool:
+        """Whether an expression refers to any of the auth helpers (Depends, Security, ...)"""
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                name = child.id
+            elif isinstance(child, ast.Attribute):
+                name = child.attr
+            else:
+                continue
+            if any(auth in name for auth in self.AUTH_DECORATORS):
+                return True
+        return False
+    
+    def _check_fastapi_security_by_lines(self):
+        """Line-based FastAPI check for code that does not parse"""
         in_endpoint = False
         endpoint_line = 0
         endpoint_code = ""
         has_auth = False
         
         for i, line in enumerate(self.lines, 1):
-            if re.search(endpoint_pattern, line):
+            if self.ENDPOINT_PATTERN.search(line):
                 if in_endpoint and not has_auth:
                     func_name = self._get_function_name(endpoint_line)
-                    if func_name not in ['health', 'docs', 'openapi', 'metrics', 'root']:
-                        self.issues.append({
-                            "severity": "HIGH",
-                            "line": endpoint_line,
-                            "type": "Missing authentication",
-                            "code": endpoint_code,
-                            "fix": "Add Depends(get_current_user) to function parameters",
-                            "tests_needed": ["auth_required", "unauthorized_access", "token_validation"]
-                        })
+                    if func_name not in self.PUBLIC_ENDPOINTS:
+                        self.issues.append(ProductionIssue(
+                            severity="HIGH",
+                            line=endpoint_line,
+                            type="Missing authentication",
+                            code=endpoint_code,
+                            fix="Add Depends(get_current_user) to function parameters",
+                            tests_needed=self.TESTS_NEEDED["endpoint"]
+                        ))
                 
                 in_endpoint = True
                 endpoint_line = i
                 endpoint_code = line.strip()
                 has_auth = False
             
-            if in_endpoint and any(auth in line for auth in auth_decorators):
+            if in_endpoint and any(auth in line for auth in self.AUTH_DECORATORS):
                 has_auth = True
     
     def _check_pydantic_security(self):
         """Check Pydantic security in production"""
-        sensitive_fields = ['password', 'email', 'cpf', 'credit_card', 'phone', 'ssn', 'token']
+        if self.tree is None:
+            self._check_pydantic_security_by_lines()
+            return
+        
+        if 'Model' not in self.content:
+            return
         
+        fields = []
+        for node in iter_statements(self.tree):
+            if not isinstance(node, ast.ClassDef) or not self._is_model_class(node):
+                continue
+            for statement in node.body:
+                if (isinstance(statement, ast.AnnAssign)
+                        and isinstance(statement.target, ast.Name)
+                        and statement.target.id.endswith('password')):
+                    line = self._line_at(statement.lineno)
+                    if 'str' in line and 'SecretStr' not in line:
+                        fields.append(statement.lineno)
+        
+        for line in sorted(fields):
+            self.issues.append(ProductionIssue(
+                severity="HIGH",
+                line=line,
+                type="Password without SecretStr",
+                code=self._line_at(line).strip(),
+                fix="password: SecretStr",
+                tests_needed=self.TESTS_NEEDED["model"]
+            ))
+    
+    def _is_model_class(self, node: ast.ClassDef) -> bool:
+        """Whether a class looks like a Pydantic model (BaseModel or another *Model)"""
+        if 'Model' in node.name:
+            return True
+        for base in node.bases:
+            base_name = base.attr if isinstance(base, ast.Attribute) else getattr(base, 'id', '')
+            if 'Model' in base_name:
+                return True
+        return False
+    
+    def _check_pydantic_security_by_lines(self):
+        """Line-based Pydantic check for code that does not parse"""
         in_model = False
         model_name = ""
         
         for i, line in enumerate(self.lines, 1):
             if 'class' in line and ('BaseModel' in line or 'Model' in line):
                 in_model = True
-                model_match = re.search(r'class\s+(\w+)', line)
+                model_match = self.MODEL_NAME_PATTERN.search(line)
                 model_name = model_match.group(1) if model_match else "Model"
             elif in_model and line.strip() and not line.startswith(' '):
                 in_model = False
             
             if in_model:
-                for field in sensitive_fields:
+                for field in self.SENSITIVE_FIELDS:
                     if f'{field}:' in line or f'{field} :' in line:
                         if field == 'password' and 'str' in line and 'SecretStr' not in line:
-                            self.issues.append({
-                                "severity": "HIGH",
-                                "line": i,
-                                "type": "Password without SecretStr",
-                                "code": line.strip(),
-                                "fix": f"{field}: SecretStr",
-                                "tests_needed": ["secret_masking", "serialization_check", "no_plain_text"]
-                            })
-    
-    def _check_authentication(self):
-        """Check authentication patterns"""
-        auth_patterns = [
-            (r'jwt\.encode.*secret\s*=\s*["\'][^"\']{1,10}["\']', "Weak JWT secret", "CRITICAL"),
-            (r'verify_password.*==', "Timing attack vulnerability", "HIGH"),
-            (r'md5|sha1', "Weak hashing algorithm", "HIGH"),
-        ]
-        
-        for i, line in enumerate(self.lines, 1):
-            for pattern, issue_type, severity in auth_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    self.issues.append({
-                        "severity": severity,
-                        "line": i,
-                        "type": issue_type,
-                        "code": line.strip(),
-                        "fix": self._generate_auth_fix(issue_type),
-                        "tests_needed": ["crypto_strength", "timing_safety", "token_expiry"]
-                    })
-    
-    def _generate_auth_fix(self, issue_type: str) -> str:
-        """Generate authentication fix"""
-        fixes = {
-            "Weak JWT secret": "Use strong secret from environment: os.getenv('JWT_SECRET')",
-            "Timing attack vulnerability": "Use secrets.compare_digest() for secure comparison",
-            "Weak hashing algorithm": "Use bcrypt or argon2 for password hashing"
-        }
-        return fixes.get(issue_type, "Implement secure authentication")
+                            self.issues.append(ProductionIssue(
+                                severity="HIGH",
+                                line=i,
+                                type="Password without SecretStr",
+                                code=line.strip(),
+                                fix=f"{field}: SecretStr",
+                                tests_needed=self.TESTS_NEEDED["model"]
+                            ))
+    
+    def _check_authentication(self, i: int, line: str, issues: List[ProductionIssue]):
+        """Check a line for weak authentication patterns"""
+        for pattern, issue_type, severity in self.AUTH_PATTERNS:
+            if pattern.search(line):
+                issues.append(ProductionIssue(
+                    severity=severity,
+                    line=i,
+                    type=issue_type,
+                    code=line.strip(),
+                    fix=self.AUTH_FIXES.get(issue_type, "Implement secure authentication"),
+                    tests_needed=self.TESTS_NEEDED["auth"]
+                ))
     
     def _check_async_patterns(self):
         """Check async/await patterns"""
-        async_issues = [
-            (r'async def.*\n.*time\.sleep', "Blocking sleep in async", "MEDIUM"),
-            (r'async def.*\n.*requests\.(get|post)', "Sync HTTP in async", "MEDIUM"),
-        ]
+        # Each pattern runs once over the whole content. A match starting on line L
+        # is reported on lines L-4..L, the lines whose 5-line window contains it.
+        found = set()
+        for index, (pattern, _, _) in enumerate(self.ASYNC_PATTERNS):
+            for line in self._match_lines(pattern):
+                found.update((i, index) for i in range(max(1, line - 4), line + 1))
         
-        for i, line in enumerate(self.lines, 1):
-            for pattern, issue_type, severity in async_issues:
-                context = line + '\n' + '\n'.join(self.lines[i:i+5])
-                if re.search(pattern, context, re.IGNORECASE):
-                    self.issues.append({
-                        "severity": severity,
-                        "line": i,
-                        "type": issue_type,
-                        "code": line.strip(),
-                        "fix": "Use asyncio.sleep() or httpx for async operations",
-                        "tests_needed": ["async_performance", "non_blocking", "concurrency"]
-                    })
-    
-    def _check_data_protection(self):
-        """Check data protection"""
-        log_patterns = [
-            (r'(log|print).*password', "Password in logs", "HIGH"),
-            (r'(log|print).*token', "Token in logs", "HIGH"),
-            (r'(log|print).*credit_card', "Credit card in logs", "CRITICAL"),
-        ]
-        
-        for i, line in enumerate(self.lines, 1):
-            for pattern, issue_type, severity in log_patterns:
-                if re.search(pattern, line, re.IGNORECASE):
-                    self.issues.append({
-                        "severity": severity,
-                        "line": i,
-                        "type": issue_type,
-                        "code": line.strip(),
-                        "fix": "Mask sensitive data: log.info(f'User {user_id} logged in')",
-                        "tests_needed": ["log_masking", "no_sensitive_data", "audit_compliance"]
-                    })
+        for i, index in sorted(found):
+            _, issue_type, severity = self.ASYNC_PATTERNS[index]
+            self.issues.append(ProductionIssue(
+                severity=severity,
+                line=i,
+                type=issue_type,
+                code=self._line_at(i).strip(),
+                fix="Use asyncio.sleep() or httpx for async operations",
+                tests_needed=self.TESTS_NEEDED["async"]
+            ))
+    
+    def _match_lines(self, pattern: re.Pattern) -> List[int]:
+        """Line numbers where at least one match of pattern starts"""
+        lines = []
+        pos = 0
+        line_starts = self._line_starts
+        while True:
+            match = pattern.search(self.content, pos)
+            if match is None:
+                return lines
+            line = bisect_right(line_starts, match.start())
+            lines.append(line)
+            # Resume on the next line so overlapping matches on later lines are found
+            if line >= len(line_starts):
+                return lines
+            pos = line_starts[line]
+    
+    def _line_at(self, line: int) -> str:
+        """Text of a 1-based line, sliced from the content"""
+        start = self._line_starts[line - 1]
+        end = self._line_starts[line] - 1 if line < len(self._line_starts) else len(self.content)
+        return self.content[start:end]
+    
+    def _check_data_protection(self, i: int, line: str, issues: List[ProductionIssue]):
+        """Check a line for sensitive data in logs"""
+        for pattern, issue_type, severity in self.LOG_PATTERNS:
+            if pattern.search(line):
+                issues.append(ProductionIssue(
+                    severity=severity,
+                    line=i,
+                    type=issue_type,
+                    code=line.strip(),
+                    fix="Mask sensitive data: log.info(f'User {user_id} logged in')",
+                    tests_needed=self.TESTS_NEEDED["log"]
+                ))
     
     def _analyze_dependencies(self):
         """Analyze file dependencies"""
-        import_pattern = r'from\s+(\S+)\s+import|import\s+(\S+)'
-        
-        for line in self.lines:
-            match = re.search(import_pattern, line)
-            if match:
-                module = match.group(1) or match.group(2)
-                if not module.startswith('.'):
-                    self.dependencies.add(module)
+        if self.tree is not None:
+            # Absolute imports only, including multi-name and parenthesized imports
+            for node in iter_statements(self.tree):
+                if isinstance(node, ast.Import):
+                    self.dependencies.update(alias.name for alias in node.names)
+                elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                    self.dependencies.add(node.module)
+        else:
+            # Code that does not parse falls back to a line scan
+            for line in self.lines:
+                match = self.IMPORT_PATTERN.search(line)
+                if match:
+                    module = match.group(1) or match.group(2)
+                    if not module.startswith('.'):
+                        self.dependencies.add(module)
         
         # Find files that import this module
         self.impact_analysis["imports"] = list(self.dependencies)
-        self.impact_analysis["imported_by"] = self._find_importers()
+        if self.find_importers:
+            self.impact_analysis["imported_by"] = self._find_importers()
     
     def _find_importers(self) -> List[str]:
         """Find files that import this module"""
-        # This would scan the codebase - simplified for now
         module_name = Path(self.file_path).stem
-        return [f"Found in: app/api/{module_name}_router.py", 
-                f"Found in: tests/test_{module_name}.py"]
+        root = os.getcwd()
+        # The search reports paths relative to root; the hook path is usually absolute
+        own_path = os.path.abspath(self.file_path)
+        return [f"Found in: {path}" for path in _find_importers(module_name, root)
+                if os.path.abspath(os.path.join(root, path)) != own_path]
     
     def _analyze_impact(self):
         """Analyze impact of changes"""
@@ -282,12 +706,11 @@ class ProductionCodeAnalyzer:
         
     def _calculate_risk_level(self) -> str:
         """Calculate risk level based on issues and dependencies"""
-        critical_count = sum(1 for i in self.issues if i["severity"] == "CRITICAL")
-        high_count = sum(1 for i in self.issues if i["severity"] == "HIGH")
+        counts = self.severity_counts
         
-        if critical_count > 0:
+        if counts["CRITICAL"] > 0:
             return "CRITICAL"
-        elif high_count > 2:
+        elif counts["HIGH"] > 2:
             return "HIGH"
         elif len(self.dependencies) > 10:
             return "MEDIUM"
@@ -296,11 +719,12 @@ class ProductionCodeAnalyzer:
     def _identify_features(self) -> List[str]:
         """Identify affected features"""
         features = []
+        path_lower = self.file_path.lower()
         
         # Check for common patterns
-        if 'user' in self.file_path.lower():
+        if 'user' in path_lower:
             features.append("User Management")
-        if 'auth' in self.file_path.lower():
+        if 'auth' in path_lower:
             features.append("Authentication")
         if 'api' in self.file_path:
             features.append("API Endpoints")
@@ -310,9 +734,15 @@ class ProductionCodeAnalyzer:
     def _check_test_coverage(self) -> Dict[str, Any]:
         """Check test coverage for this file"""
         test_file = self.file_path.replace('/app/', '/tests/test_').replace('.py', '_test.py')
+        # One stat answers both whether the test exists and when it last changed
+        try:
+            mtime = os.stat(test_file).st_mtime
+        except (OSError, ValueError):
+            mtime = None
         return {
             "test_file": test_file,
-            "exists": os.path.exists(test_file),
+            "exists": mtime is not None,
+            "mtime": mtime,
             "coverage_estimate": "Unknown - run pytest --cov to check"
         }
     
@@ -320,7 +750,7 @@ class ProductionCodeAnalyzer:
         """Extract function name"""
         for i in range(start_line, min(start_line + 5, len(self.lines))):
             if i < len(self.lines) and 'def ' in self.lines[i]:
-                match = re.search(r'def\s+(\w+)', self.lines[i])
+                match = self.FUNCTION_NAME_PATTERN.search(self.lines[i])
                 if match:
                     return match.group(1)
         return ""
@@ -331,76 +761,87 @@ class SafeRefactorEngine:
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.backup_dir = Path(".claude/backups")
-        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.backup_dir = _ensure_dir(Path(".claude/backups"))
         
     def create_backup(self, file_path: str, content: str) -> str:
         """Create backup of original file"""
+        data = content.encode('utf-8')
+        digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+        suffix = f"_{digest}_{Path(file_path).name}"
+        
+        # Identical content was backed up before: reuse that backup
+        backups = self._backups()
+        existing = backups.get(suffix)
+        if existing is not None and existing.exists():
+            return str(existing)
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{timestamp}_{Path(file_path).name}"
-        backup_path = self.backup_dir / backup_name
+        backup_path = self.backup_dir / f"{timestamp}{suffix}"
+        
+        # Written in a single call, bypassing the text layer
+        backup_path.write_bytes(data)
+        backups[suffix] = backup_path
         
-        with open(backup_path, 'w') as f:
-            f.write(content)
-            
         return str(backup_path)
     
-    def generate_tests(self, file_path: str, issues: List[Dict], 
+    def _backups(self) -> Dict[str, Path]:
+        """Index of the backup dir, scanned on first use in this process"""
+        key = os.path.abspath(self.backup_dir)
+        backups = _backup_index.get(key)
+        if backups is None:
+            backups = {}
+            for entry in self.backup_dir.iterdir():
+                match = BACKUP_NAME_PATTERN.match(entry.name)
+                if match:
+                    backups[match.group(1)] = entry
+            _backup_index[key] = backups
+        return backups
+    
+    def generate_tests(self, file_path: str, issues: List[ProductionIssue], 
                       impact: Dict) -> Dict[str, str]:
         """Generate tests for current behavior"""
         test_generator = TestGenerator(self.config)
         return test_generator.generate_tests(file_path, issues, impact)
     
-    def create_migration_plan(self, issues: List[Dict], impact: Dict) -> Dict[str, Any]:
-        """Create detailed migration plan"""
+    def create_migration_plan(self, issues: List[ProductionIssue], impact: Dict,
+                              severity_counts: Optional[Counter] = None) -> Dict[str, Any]:
+        """Create detailed migration plan (severity_counts: the analyzer's histogram of issues)"""
+        if severity_counts is None:
+            severity_counts = Counter(issue.severity for issue in issues)
+        
         plan = {
             "total_issues": len(issues),
-            "critical_issues": sum(1 for i in issues if i["severity"] == "CRITICAL"),
-            "estimated_time": self._estimate_time(issues),
+            "critical_issues": severity_counts["CRITICAL"],
+            "estimated_time": self._estimate_time(len(issues), severity_counts["CRITICAL"]),
             "steps": []
         }
         
         # Group issues by type
-        grouped = {}
+        grouped = defaultdict(list)
         for issue in issues:
-            issue_type = issue["type"]
-            if issue_type not in grouped:
-                grouped[issue_type] = []
-            grouped[issue_type].append(issue)
+            grouped[issue.type].append(issue)
         
         # Create steps
         for issue_type, type_issues in grouped.items():
-            step = {
+            plan["steps"].append({
                 "type": issue_type,
                 "count": len(type_issues),
-                "actions": [],
-                "tests": set()
-            }
-            
-            for issue in type_issues:
-                step["actions"].append({
-                    "line": issue["line"],
-                    "change": issue["fix"],
-                    "risk": issue["severity"]
-                })
-                step["tests"].update(issue["tests_needed"])
-            
-            step["tests"] = list(step["tests"])
-            plan["steps"].append(step)
+                "actions": [
+                    {"line": issue.line, "change": issue.fix, "risk": issue.severity}
+                    for issue in type_issues
+                ],
+                # Sorted so the plan does not depend on set iteration order
+                "tests": sorted(set().union(*(issue.tests_needed for issue in type_issues)))
+            })
         
         return plan
     
-    def _estimate_time(self, issues: List[Dict]) -> str:
+    def _estimate_time(self, total: int, critical: int) -> str:
         """Estimate time for safe refactoring"""
         base_time = 5  # minutes per issue
         critical_multiplier = 3
         
-        time_minutes = 0
-        for issue in issues:
-            if issue["severity"] == "CRITICAL":
-                time_minutes += base_time * critical_multiplier
-            else:
-                time_minutes += base_time
+        time_minutes = (critical * critical_multiplier + (total - critical)) * base_time
         
         if time_minutes < 60:
             return f"{time_minutes} minutes"
@@ -412,21 +853,19 @@ class TestGenerator:
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.test_dir = Path("tests/legacy_guardian")
-        self.test_dir.mkdir(parents=True, exist_ok=True)
+        self.test_dir = _ensure_dir(Path("tests/legacy_guardian"))
         
-    def generate_tests(self, file_path: str, issues: List[Dict], 
+    def generate_tests(self, file_path: str, issues: List[ProductionIssue], 
                       impact: Dict) -> Dict[str, str]:
         """Generate comprehensive tests"""
         module_name = Path(file_path).stem
-        test_file = self.test_dir / f"test_{module_name}_current_behavior.py"
+        test_file = self.test_dir / f"test_{_output_name(file_path)}_current_behavior.py"
         
         # Generate test content
         test_content = self._generate_test_content(file_path, issues, impact)
         
         # Write test file
-        with open(test_file, 'w') as f:
-            f.write(test_content)
+        test_file.write_text(test_content, encoding='utf-8')
         
         return {
             "test_file": str(test_file),
@@ -437,12 +876,13 @@ class TestGenerator:
             ]
         }
     
-    def _generate_test_content(self, file_path: str, issues: List[Dict], 
+    def _generate_test_content(self, file_path: str, issues: List[ProductionIssue], 
                               impact: Dict) -> str:
         """Generate actual test content"""
         module_name = Path(file_path).stem
         
-        content = f'''"""
+        # Fragments already end in newlines; joined once at the end
+        parts = [f'''"""
 🧪 LEGACY GUARDIAN TEST SUITE
 Generated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 Purpose: Validate current behavior before refactoring
@@ -473,21 +913,21 @@ class TestCurrentBehavior:
             "email": "test@example.com",
             "password": "plain_password"  # Current insecure behavior
         }}
-'''
+''']
 
         # Generate tests for each issue
         for i, issue in enumerate(issues):
-            if "SQL Injection" in issue["type"]:
-                content += self._generate_sql_injection_test(i, issue)
-            elif "Hardcoded" in issue["type"]:
-                content += self._generate_hardcoded_test(i, issue)
-            elif "Missing authentication" in issue["type"]:
-                content += self._generate_auth_test(i, issue)
-            elif "Password" in issue["type"]:
-                content += self._generate_password_test(i, issue)
+            if "SQL Injection" in issue.type:
+                parts.append(self._generate_sql_injection_test(i, issue))
+            elif "Hardcoded" in issue.type:
+                parts.append(self._generate_hardcoded_test(i, issue))
+            elif "Missing authentication" in issue.type:
+                parts.append(self._generate_auth_test(i, issue))
+            elif "Password" in issue.type:
+                parts.append(self._generate_password_test(i, issue))
         
         # Add integration tests
-        content += '''
+        parts.append('''
     
 class TestIntegrationBehavior:
     """Integration tests for current implementation"""
@@ -507,10 +947,10 @@ class TestIntegrationBehavior:
         """Test edge cases with current implementation"""
         # Include boundary conditions
         pass
-'''
+''')
 
         # Add performance tests
-        content += '''
+        parts.append('''
 
 class TestPerformanceBaseline:
     """Performance baseline tests"""
@@ -533,16 +973,16 @@ class TestPerformanceBaseline:
         final_memory = process.memory_info().rss
         memory_increase = final_memory - initial_memory
         assert memory_increase < 10 * 1024 * 1024  # 10MB threshold
-'''
+''')
 
-        return content
+        return ''.join(parts)
     
-    def _generate_sql_injection_test(self, index: int, issue: Dict) -> str:
+    def _generate_sql_injection_test(self, index: int, issue: ProductionIssue) -> str:
         """Generate SQL injection test"""
         return f'''
     
     def test_sql_injection_behavior_{index}(self):
-        """Current SQL injection vulnerability - Line {issue['line']}"""
+        """Current SQL injection vulnerability - Line {issue.line}"""
         # WARNING: This documents INSECURE behavior
         # After fix, this test should verify injection is prevented
         
@@ -567,12 +1007,12 @@ class TestPerformanceBaseline:
         pass
 '''
     
-    def _generate_hardcoded_test(self, index: int, issue: Dict) -> str:
+    def _generate_hardcoded_test(self, index: int, issue: ProductionIssue) -> str:
         """Generate hardcoded secrets test"""
         return f'''
     
     def test_hardcoded_secret_{index}(self):
-        """Current hardcoded secret - Line {issue['line']}"""
+        """Current hardcoded secret - Line {issue.line}"""
         # Document current hardcoded value
         # After fix, verify value comes from environment
         
@@ -585,12 +1025,12 @@ class TestPerformanceBaseline:
         pass
 '''
     
-    def _generate_auth_test(self, index: int, issue: Dict) -> str:
+    def _generate_auth_test(self, index: int, issue: ProductionIssue) -> str:
         """Generate authentication test"""
         return f'''
     
     def test_missing_auth_{index}(self):
-        """Current missing authentication - Line {issue['line']}"""
+        """Current missing authentication - Line {issue.line}"""
         # Document that endpoint currently allows unauthenticated access
         
         # Current behavior: no auth required
@@ -603,12 +1043,12 @@ class TestPerformanceBaseline:
         pass
 '''
     
-    def _generate_password_test(self, index: int, issue: Dict) -> str:
+    def _generate_password_test(self, index: int, issue: ProductionIssue) -> str:
         """Generate password handling test"""
         return f'''
     
     def test_password_handling_{index}(self):
-        """Current password handling - Line {issue['line']}"""
+        """Current password handling - Line {issue.line}"""
         # Test current password storage/handling
         
         password = "test_password_123"
@@ -627,7 +1067,22 @@ class TestPerformanceBaseline:
 class LegacyGuardian:
     """Main Legacy Guardian system"""
     
+    # analyze_paths only starts worker processes for batches at least this big
+    PARALLEL_MIN_FILES = 4
+    PARALLEL_BATCH_SIZE = 16
+    
+    # Report impact per issue kind; an issue matches when its type contains the key
+    IMPACTS = {
+        "SQL Injection": "Crítico - permite acesso não autorizado ao banco",
+        "Hardcoded password": "Crítico - expõe credenciais em código",
+        "Missing authentication": "Alto - endpoint exposto publicamente",
+        "Weak JWT secret": "Crítico - tokens podem ser forjados",
+        "Password in logs": "Alto - expõe senhas em arquivos de log"
+    }
+    IMPACT_PATTERN = re.compile('|'.join(map(re.escape, IMPACTS)))
+    
     def __init__(self, config_path: str = "hooks/guardian_config.json"):
+        self.config_path = config_path
         self.config = self._load_config(config_path)
         self.analyzer = ProductionCodeAnalyzer(self.config)
         self.refactor_engine = SafeRefactorEngine(self.config)
@@ -635,8 +1090,13 @@ class LegacyGuardian:
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration"""
         try:
-            with open(config_path, 'r') as f:
-                return json.load(f)
+            key = (os.path.abspath(config_path), os.stat(config_path).st_mtime)
+            config = _config_cache.get(key)
+            if config is None:
+                with open(config_path, 'r') as f:
+                    config = json.load(f)
+                _config_cache[key] = config
+            return config
         except FileNotFoundError:
             return {
                 "legacy_guardian": {
@@ -672,7 +1132,8 @@ class LegacyGuardian:
             test_info = self.refactor_engine.generate_tests(file_path, issues, impact)
         
         # Create migration plan
-        migration_plan = self.refactor_engine.create_migration_plan(issues, impact)
+        migration_plan = self.refactor_engine.create_migration_plan(
+            issues, impact, self.analyzer.severity_counts)
         
         # Generate report
         report = self._generate_report(
@@ -688,139 +1149,169 @@ class LegacyGuardian:
             "migration_plan": migration_plan
         }
     
-    def _generate_report(self, file_path: str, issues: List[Dict], 
+    def analyze_paths(self, paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Analyze several files, in worker processes when there are enough of them"""
+        # A path given twice would have two workers writing the same outputs
+        paths = list(dict.fromkeys(paths))
+        if len(paths) < self.PARALLEL_MIN_FILES:
+            self.analyzer.find_importers = True
+            try:
+                return {path: self.analyze_file(path, Path(path).read_text(encoding='utf-8'))
+                        for path in paths}
+            finally:
+                self.analyzer.find_importers = False
+        
+        from concurrent.futures import ProcessPoolExecutor
+        
+        workers = os.cpu_count() or 1
+        chunksize = max(1, min(self.PARALLEL_BATCH_SIZE, len(paths) // workers))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.config_path,)) as pool:
+            results = pool.map(_analyze_in_worker, paths, chunksize=chunksize)
+            return dict(zip(paths, results))
+    
+    def _generate_report(self, file_path: str, issues: List[ProductionIssue], 
                         impact: Dict, backup_path: str, test_info: Dict,
                         migration_plan: Dict, is_production: bool) -> str:
         """Generate comprehensive security audit report"""
-        report = []
-        report.append("=" * 62)
-        report.append("🛡️  LEGACY GUARDIAN SECURITY AUDIT")
-        report.append(f"📄 File: {file_path}{' (Production Code - Handle with Care!)' if is_production else ''}")
-        report.append(f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append("=" * 62)
-        report.append("")
+        report = io.StringIO()
+        write = report.write
+        write("=" * 62 + "\n")
+        write("🛡️  LEGACY GUARDIAN SECURITY AUDIT\n")
+        write(f"📄 File: {file_path}{' (Production Code - Handle with Care!)' if is_production else ''}\n")
+        write(f"🕒 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        write("=" * 62 + "\n")
+        write("\n")
         
         if is_production:
-            report.append("⚠️ ANÁLISE DE CÓDIGO EM PRODUÇÃO DETECTADA")
-            report.append("Este arquivo está em produção. Qualquer mudança seguirá processo seguro.")
-            report.append("")
+            write("⚠️ ANÁLISE DE CÓDIGO EM PRODUÇÃO DETECTADA\n")
+            write("Este arquivo está em produção. Qualquer mudança seguirá processo seguro.\n")
+            write("\n")
         
         # Summary
-        report.append("🔍 ISSUES ENCONTRADAS:")
-        report.append("")
+        write("🔍 ISSUES ENCONTRADAS:\n")
+        write("\n")
         
         # Group by severity
         for severity in ["CRITICAL", "HIGH", "MEDIUM", "LOW"]:
-            severity_issues = [i for i in issues if i["severity"] == severity]
+            severity_issues = [i for i in issues if i.severity == severity]
             if severity_issues:
                 emoji = {"CRITICAL": "🚨", "HIGH": "❌", "MEDIUM": "⚠️", "LOW": "ℹ️"}[severity]
-                report.append(f"{emoji} {severity} RISK ({len(severity_issues)} issues)")
-                report.append("-" * 40)
+                write(f"{emoji} {severity} RISK ({len(severity_issues)} issues)\n")
+                write("-" * 40 + "\n")
                 
                 for issue in severity_issues[:3]:  # Show first 3
-                    report.append(f"Line {issue['line']}: {issue['type']}")
-                    report.append(f"   Impacto: {self._describe_impact(issue)}")
+                    write(f"Line {issue.line}: {issue.type}\n")
+                    write(f"   Impacto: {self._describe_impact(issue)}\n")
                     
                 if len(severity_issues) > 3:
-                    report.append(f"   ... and {len(severity_issues) - 3} more")
-                report.append("")
+                    write(f"   ... and {len(severity_issues) - 3} more\n")
+                write("\n")
         
         # Safe refactor plan
         if is_production:
-            report.append("📋 PLANO DE AÇÃO SEGURO:")
-            report.append("")
+            write("📋 PLANO DE AÇÃO SEGURO:\n")
+            write("\n")
             
-            report.append("1️⃣ PREPARAÇÃO")
-            report.append("-" * 40)
-            report.append(f"✅ Backup criado: {backup_path}")
-            report.append("✅ Dependencies mapeadas:")
+            write("1️⃣ PREPARAÇÃO\n")
+            write("-" * 40 + "\n")
+            write(f"✅ Backup criado: {backup_path}\n")
+            write("✅ Dependencies mapeadas:\n")
             for dep in impact.get("imports", [])[:5]:
-                report.append(f"   - {dep}")
+                write(f"   - {dep}\n")
             
             if test_info:
-                report.append(f"✅ {test_info['test_count']} testes gerados em: {test_info['test_file']}")
-            report.append("")
+                write(f"✅ {test_info['test_count']} testes gerados em: {test_info['test_file']}\n")
+            write("\n")
             
-            report.append("2️⃣ TESTES DO COMPORTAMENTO ATUAL")
-            report.append("-" * 40)
-            report.append("```python")
-            report.append("# Teste 1: Validar comportamento atual")
-            report.append("def test_current_behavior():")
-            report.append("    # Documenta comportamento antes da mudança")
-            report.append("    result = function_under_test()")
-            report.append("    assert result == expected_current_behavior")
-            report.append("```")
-            report.append("")
+            write("2️⃣ TESTES DO COMPORTAMENTO ATUAL\n")
+            write("-" * 40 + "\n")
+            write("```python\n")
+            write("# Teste 1: Validar comportamento atual\n")
+            write("def test_current_behavior():\n")
+            write("    # Documenta comportamento antes da mudança\n")
+            write("    result = function_under_test()\n")
+            write("    assert result == expected_current_behavior\n")
+            write("```\n")
+            write("\n")
             
-            report.append("3️⃣ MUDANÇAS PROPOSTAS (Safe Refactor)")
-            report.append("-" * 40)
+            write("3️⃣ MUDANÇAS PROPOSTAS (Safe Refactor)\n")
+            write("-" * 40 + "\n")
             
             # Show first critical fix
-            critical = next((i for i in issues if i["severity"] == "CRITICAL"), None)
+            critical = next((i for i in issues if i.severity == "CRITICAL"), None)
             if critical:
-                report.append("```diff")
-                report.append(f"- {critical['code']}")
-                report.append(f"+ {critical['fix']}")
-                report.append("```")
-            report.append("")
+                write("```diff\n")
+                write(f"- {critical.code}\n")
+                write(f"+ {critical.fix}\n")
+                write("```\n")
+            write("\n")
             
-            report.append("4️⃣ VALIDAÇÃO")
-            report.append("-" * 40)
-            report.append("[ ] Rodar suite de testes atual")
-            report.append("[ ] Aplicar mudanças")
-            report.append("[ ] Re-rodar todos os testes")
-            report.append("[ ] Verificar logs de produção")
-            report.append("[ ] Monitorar por 24h")
-            report.append("")
+            write("4️⃣ VALIDAÇÃO\n")
+            write("-" * 40 + "\n")
+            write("[ ] Rodar suite de testes atual\n")
+            write("[ ] Aplicar mudanças\n")
+            write("[ ] Re-rodar todos os testes\n")
+            write("[ ] Verificar logs de produção\n")
+            write("[ ] Monitorar por 24h\n")
+            write("\n")
             
-            report.append("5️⃣ ROLLBACK (se necessário)")
-            report.append("-" * 40)
-            report.append("Em caso de qualquer problema:")
-            report.append(f"1. cp {backup_path} {file_path}")
-            report.append("2. Restart services")
-            report.append("3. Verificar restored functionality")
-            report.append("")
+            write("5️⃣ ROLLBACK (se necessário)\n")
+            write("-" * 40 + "\n")
+            write("Em caso de qualquer problema:\n")
+            write(f"1. cp {backup_path} {file_path}\n")
+            write("2. Restart services\n")
+            write("3. Verificar restored functionality\n")
+            write("\n")
         
         # Commands
-        report.append("=" * 62)
-        report.append("💬 COMANDOS DISPONÍVEIS:")
-        report.append('- "Gere os testes de comportamento atual"')
-        report.append('- "Aplique o plano de mudança segura"')
-        report.append('- "Reverta para o backup"')
-        report.append('- "Mostre análise de impacto detalhada"')
-        report.append("=" * 62)
+        write("=" * 62 + "\n")
+        write("💬 COMANDOS DISPONÍVEIS:\n")
+        write('- "Gere os testes de comportamento atual"\n')
+        write('- "Aplique o plano de mudança segura"\n')
+        write('- "Reverta para o backup"\n')
+        write('- "Mostre análise de impacto detalhada"\n')
+        write("=" * 62)
         
         # Save report
-        self._save_report('\n'.join(report))
+        report_text = report.getvalue()
+        self._save_report(file_path, report_text)
         
-        return '\n'.join(report)
+        return report_text
     
-    def _describe_impact(self, issue: Dict) -> str:
+    def _describe_impact(self, issue: ProductionIssue) -> str:
         """Describe impact of an issue"""
-        impacts = {
-            "SQL Injection": "Crítico - permite acesso não autorizado ao banco",
-            "Hardcoded password": "Crítico - expõe credenciais em código",
-            "Missing authentication": "Alto - endpoint exposto publicamente",
-            "Weak JWT secret": "Crítico - tokens podem ser forjados",
-            "Password in logs": "Alto - expõe senhas em arquivos de log"
-        }
-        
-        for key, impact in impacts.items():
-            if key in issue["type"]:
-                return impact
+        match = self.IMPACT_PATTERN.search(issue.type)
+        if match:
+            return self.IMPACTS[match.group(0)]
         
         return "Requer análise detalhada"
     
-    def _save_report(self, report: str):
+    def _save_report(self, file_path: str, report: str):
         """Save audit report"""
-        report_dir = Path(".claude/security_reports")
-        report_dir.mkdir(parents=True, exist_ok=True)
+        report_dir = _ensure_dir(Path(".claude/security_reports"))
         
+        # Batch runs finish several files per second, so the name also identifies the file
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_file = report_dir / f"legacy_audit_{timestamp}.txt"
+        report_file = report_dir / f"legacy_audit_{timestamp}_{_output_name(file_path)}.txt"
         
-        with open(report_file, 'w') as f:
-            f.write(report)
+        # Encode once and write raw bytes (no text-layer wrapper per report)
+        report_file.write_bytes(report.encode('utf-8'))
+
+
+# Each worker process builds its LegacyGuardian once and reuses it for every file it receives
+_worker_guardian: Optional[LegacyGuardian] = None
+
+
+def _init_worker(config_path: str):
+    global _worker_guardian
+    _worker_guardian = LegacyGuardian(config_path)
+    # Workers only serve batch runs, which include the importer search
+    _worker_guardian.analyzer.find_importers = True
+
+
+def _analyze_in_worker(path: str) -> Dict[str, Any]:
+    return _worker_guardian.analyze_file(path, Path(path).read_text(encoding='utf-8'))
 
 
 def main():
@@ -838,19 +1329,20 @@ def main():
     if not file_path.endswith('.py'):
         sys.exit(0)
     
-    # Read content
-    content = sys.stdin.read()
+    # Read content as bytes; only the analysis needs it decoded
+    raw = sys.stdin.buffer.read()
     
     # Analyze
     guardian = LegacyGuardian()
-    result = guardian.analyze_file(file_path, content)
+    result = guardian.analyze_file(file_path, raw.decode('utf-8', errors='replace'))
     
     # Output report if issues found
     if result["status"] == "issues_found":
         print(result["report"], file=sys.stderr)
     
-    # Always pass through content (PostToolUse doesn't block)
-    print(content, end='')
+    # Always pass through content untouched (PostToolUse doesn't block), skipping the text layer
+    sys.stdout.buffer.write(raw)
+    sys.stdout.buffer.flush()
     sys.exit(0)
 
 
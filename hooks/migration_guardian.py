@@ -6,6 +6,12 @@ Migration Guardian Hook Entry Point
 import sys
 import json
 
+# Optional: orjson parses the hook payload faster than the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Add hooks directory to path to import the module
 sys.path.insert(0, 'hooks')
 
@@ -14,8 +20,9 @@ from migration_guardian.main import MigrationGuardian
 
 def main():
     """Hook entry point"""
-    # Read hook data from stdin
-    hook_data = json.loads(sys.stdin.read())
+    # Read hook data from stdin as bytes; both parsers accept them undecoded
+    raw = sys.stdin.buffer.read()
+    hook_data = orjson.loads(raw) if orjson is not None else json.loads(raw)
     
     # Run Migration Guardian
     guardian = MigrationGuardian()
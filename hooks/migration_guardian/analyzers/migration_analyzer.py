@@ -3,23 +3,113 @@ Migration Analyzer
 Analyzes generated migrations for potential issues and optimizations
 """
 
+import hashlib
+import json
+import os
 import re
 import subprocess
+from bisect import bisect_left
+from collections import Counter
 from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, List, Optional, Any, Tuple
 
 from ..utils.logger import logger
 
 
+# Optional: RE2 matches in guaranteed linear time
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+def _compile_operation_pattern(source: str):
+    """Compile with RE2 when it is installed and accepts the pattern, else with re"""
+    if re2 is not None:
+        try:
+            return re2.compile(source)
+        except re2.error:
+            pass
+    return re.compile(source)
+
+
+# Common Alembic operations, each called as op.<name>. Runs of arbitrary text end at
+# the next comma or quote rather than at a length cap, so long raw SQL is still seen.
+OPERATION_SOURCES = {
+    'create_table': r'create_table\s*\(\s*["\'](\w+)["\']',
+    'drop_table': r'drop_table\s*\(\s*["\'](\w+)["\']',
+    'add_column': r'add_column\s*\(\s*["\'](\w+)["\'],\s*sa\.Column\s*\(\s*["\'](\w+)["\']',
+    'drop_column': r'drop_column\s*\(\s*["\'](\w+)["\'],\s*["\'](\w+)["\']',
+    'alter_column': r'alter_column\s*\(\s*["\'](\w+)["\'],\s*["\'](\w+)["\']',
+    'create_index': r'create_index\s*\(\s*["\'](\w+)["\'],\s*["\'](\w+)["\']',
+    'drop_index': r'drop_index\s*\(\s*["\'](\w+)["\']',
+    'create_foreign_key': r'create_foreign_key\s*\([^,]+,\s*["\'](\w+)["\']',
+    'drop_constraint': r'drop_constraint\s*\([^,]+,\s*["\'](\w+)["\']',
+    'execute': r'execute\s*\(\s*["\']([^"\']+)["\']'
+}
+
+# Every operation as one alternation behind the shared 'op.' prefix, compiled once at
+# import: a single scan finds them all and match.lastgroup names the operation
+OPERATION_PATTERN = _compile_operation_pattern(r'op\.(?:' + '|'.join(
+    f'(?P<{op_type}>{source})'
+    for op_type, source in OPERATION_SOURCES.items()
+) + ')')
+
+# Operation fields filled from each operation's captured groups, in order
+OPERATION_FIELDS = {
+    'create_table': ('table',),
+    'drop_table': ('table',),
+    'add_column': ('table', 'column'),
+    'drop_column': ('table', 'column'),
+    'alter_column': ('table', 'column'),
+    'create_index': ('index', 'table'),
+    'drop_index': ('index',),
+    'create_foreign_key': (),
+    'drop_constraint': (),
+    'execute': ('sql',)
+}
+
+# Larger files are not scanned for operations (autogenerated migrations are far smaller)
+MAX_MIGRATION_BYTES = 5 * 1024 * 1024
+
+NEWLINE_PATTERN = re.compile(r'\n')
+
+# Column details looked up around each operation
+SERVER_DEFAULT_PATTERN = re.compile(r'server_default=([^,\)]+)')
+COLUMN_TYPE_PATTERN = re.compile(r'sa\.(\w+)(?:\([^)]*\))?')
+
+# Destructive statements inside op.execute(...) raw SQL
+DANGEROUS_SQL_PATTERN = re.compile(r'\b(?:DROP|DELETE|TRUNCATE)\b', re.IGNORECASE)
+
+# In a real implementation, row counts would come from the database
+# For now, use mock estimates (read-only, shared by every analyzer)
+ROW_ESTIMATES = MappingProxyType({
+    'users': 10000,
+    'files': 50000,
+    'conversations': 25000,
+    'agents': 100,
+    'sessions': 100000
+})
+
+# Bump whenever the analysis output changes so stale cache entries are ignored
+ANALYSIS_CACHE_VERSION = 1
+
+
 class MigrationAnalyzer:
     """Analyzes Alembic migrations"""
     
+    # analyze_migrations only starts worker processes for batches at least this big
+    PARALLEL_MIN_FILES = 4
+    PARALLEL_BATCH_SIZE = 16
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.alembic_dir = Path("alembic/versions")
+        self.cache_dir = Path(".migration_guardian_cache") / "migrations"
         
     def analyze_migration(self, migration_path: Path) -> Dict[str, Any]:
-        """Analyze a single migration file"""
+        """Analyze a single migration file (cached while the file is unchanged)"""
         analysis = {
             'file': migration_path.name,
             'operations': [],
@@ -30,7 +120,23 @@ class MigrationAnalyzer:
             'affected_rows': {}
         }
         
+        # Alembic revisions are always Python modules
+        if migration_path.suffix != '.py':
+            return analysis
+            
+        cache_file = self._get_cache_path(migration_path)
+        if cache_file is not None and cache_file.exists():
+            try:
+                return json.loads(cache_file.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable analysis cache {cache_file}: {e}")
+                
         try:
+            # Don't read oversized files at all (_extract_operations would skip them anyway)
+            if migration_path.stat().st_size > MAX_MIGRATION_BYTES:
+                logger.warning(f"Migration larger than {MAX_MIGRATION_BYTES} bytes, operations not extracted")
+                return analysis
+                
             content = migration_path.read_text()
             
             # Extract operations
@@ -38,91 +144,151 @@ class MigrationAnalyzer:
             analysis['operations'] = operations
             
             # Analyze each operation
+            risks = analysis['risks']
+            warnings = analysis['warnings']
+            recommendations = analysis['recommendations']
+            affected_rows = analysis['affected_rows']
+            estimated_time = 0
             for op in operations:
                 op_analysis = self._analyze_operation(op)
                 
                 if op_analysis['risk'] != 'LOW':
-                    analysis['risks'].append(op_analysis)
-                    
-                if op_analysis.get('warnings'):
-                    analysis['warnings'].extend(op_analysis['warnings'])
+                    risks.append(op_analysis)
                     
-                if op_analysis.get('recommendations'):
-                    analysis['recommendations'].extend(op_analysis['recommendations'])
+                warnings += op_analysis['warnings']
+                recommendations += op_analysis['recommendations']
                     
                 # Estimate time
-                analysis['estimated_time'] += op_analysis.get('estimated_time', 0)
+                estimated_time += op_analysis['estimated_time']
                 
                 # Track affected rows
-                if op_analysis.get('table'):
-                    table = op_analysis['table']
-                    if table not in analysis['affected_rows']:
-                        analysis['affected_rows'][table] = self._estimate_row_count(table)
+                table = op_analysis.get('table')
+                if table and table not in affected_rows:
+                    affected_rows[table] = self._estimate_row_count(table)
+                    
+            analysis['estimated_time'] = estimated_time
                         
         except Exception as e:
             logger.error(f"Error analyzing migration {migration_path}: {e}")
             analysis['warnings'].append(f"Analysis error: {e}")
+            return analysis
+            
+        if cache_file is not None:
+            self._cache_analysis(cache_file, analysis)
             
         return analysis
         
+    def analyze_migrations(self, paths: Optional[List[Path]] = None) -> Dict[str, Dict[str, Any]]:
+        """Analyze several migrations (default: alembic/versions), in worker processes if there are enough"""
+        if paths is None:
+            paths = sorted(self.alembic_dir.glob("*.py"))
+            
+        # Cached analyses are cheap to load here; only the rest is worth shipping to workers
+        results = {}
+        pending = []
+        for path in paths:
+            cache_file = self._get_cache_path(path)
+            if cache_file is not None and cache_file.exists():
+                results[str(path)] = self.analyze_migration(path)
+            else:
+                pending.append(path)
+                
+        if len(pending) < self.PARALLEL_MIN_FILES:
+            for path in pending:
+                results[str(path)] = self.analyze_migration(path)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            
+            workers = os.cpu_count() or 1
+            chunksize = max(1, min(self.PARALLEL_BATCH_SIZE, len(pending) // workers))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.config,)) as pool:
+                analyses = pool.map(_analyze_in_worker, pending, chunksize=chunksize)
+                for path, analysis in zip(pending, analyses):
+                    results[str(path)] = analysis
+                    
+        # Report in the order the paths were given
+        return {str(path): results[str(path)] for path in paths}
+        
+    def _get_cache_path(self, migration_path: Path) -> Optional[Path]:
+        """Get the cache file for the current version of a migration"""
+        try:
+            stat = migration_path.stat()
+        except OSError:
+            return None
+            
+        # Committed migrations never change, so path + mtime + size identify the content.
+        # Every version of one migration shares the path prefix, so a new entry can replace the old.
+        path_key = hashlib.sha1(str(migration_path.resolve()).encode()).hexdigest()[:16]
+        version_key = hashlib.sha1(
+            f"{ANALYSIS_CACHE_VERSION}:{stat.st_mtime_ns}:{stat.st_size}".encode()).hexdigest()[:16]
+        return self.cache_dir / f"{path_key}_{version_key}.json"
+        
+    def _cache_analysis(self, cache_file: Path, analysis: Dict[str, Any]) -> None:
+        """Store an analysis result, dropping the entries of older versions of the same migration"""
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            cache_file.write_text(json.dumps(analysis), encoding='utf-8')
+            path_key = cache_file.name.split('_', 1)[0]
+            for stale_file in cache_file.parent.glob(f"{path_key}_*.json"):
+                if stale_file != cache_file:
+                    stale_file.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Could not cache migration analysis: {e}")
+            
+    def invalidate_cache(self) -> None:
+        """Drop every cached migration analysis"""
+        if self.cache_dir.exists():
+            for cache_file in self.cache_dir.glob("*.json"):
+                cache_file.unlink(missing_ok=True)
+        
     def _extract_operations(self, content: str) -> List[Dict[str, Any]]:
         """Extract operations from migration content"""
         operations = []
         
-        # Pattern matching for common Alembic operations
-        patterns = {
-            'create_table': r'op\.create_table\s*\(\s*["\'](\w+)["\']',
-            'drop_table': r'op\.drop_table\s*\(\s*["\'](\w+)["\']',
-            'add_column': r'op\.add_column\s*\(\s*["\'](\w+)["\'],\s*sa\.Column\s*\(\s*["\'](\w+)["\']',
-            'drop_column': r'op\.drop_column\s*\(\s*["\'](\w+)["\'],\s*["\'](\w+)["\']',
-            'alter_column': r'op\.alter_column\s*\(\s*["\'](\w+)["\'],\s*["\'](\w+)["\']',
-            'create_index': r'op\.create_index\s*\(\s*["\'](\w+)["\'],\s*["\'](\w+)["\']',
-            'drop_index': r'op\.drop_index\s*\(\s*["\'](\w+)["\']',
-            'create_foreign_key': r'op\.create_foreign_key\s*\([^,]+,\s*["\'](\w+)["\']',
-            'drop_constraint': r'op\.drop_constraint\s*\([^,]+,\s*["\'](\w+)["\']',
-            'execute': r'op\.execute\s*\(\s*["\']([^"\']+)["\']'
-        }
+        if len(content) > MAX_MIGRATION_BYTES:
+            logger.warning(f"Migration larger than {MAX_MIGRATION_BYTES} bytes, operations not extracted")
+            return operations
+            
+        # Every operation pattern starts with 'op.': files without it have nothing to match
+        if 'op.' not in content:
+            return operations
+        
+        # Split once; match offsets map to line numbers through the newline offsets
+        lines = content.split('\n')
+        newline_offsets = [m.start() for m in NEWLINE_PATTERN.finditer(content)]
         
-        for op_type, pattern in patterns.items():
-            matches = re.finditer(pattern, content, re.MULTILINE | re.DOTALL)
+        # Pattern matching for common Alembic operations: one scan, grouped by operation type
+        matches_by_type = {op_type: [] for op_type in OPERATION_SOURCES}
+        for match in OPERATION_PATTERN.finditer(content):
+            matches_by_type[match.lastgroup].append(match)
             
+        for op_type, matches in matches_by_type.items():
+            fields = OPERATION_FIELDS[op_type]
+            first_group = OPERATION_PATTERN.groupindex[op_type] + 1
             for match in matches:
+                line_index = bisect_left(newline_offsets, match.start())
                 operation = {
                     'type': op_type.upper(),
-                    'line': content[:match.start()].count('\n') + 1
+                    'line': line_index + 1
                 }
                 
                 # Extract details based on operation type
-                if op_type == 'create_table':
-                    operation['table'] = match.group(1)
-                elif op_type == 'drop_table':
-                    operation['table'] = match.group(1)
-                elif op_type in ['add_column', 'drop_column', 'alter_column']:
-                    operation['table'] = match.group(1)
-                    operation['column'] = match.group(2)
-                elif op_type == 'create_index':
-                    operation['index'] = match.group(1)
-                    operation['table'] = match.group(2)
-                elif op_type == 'drop_index':
-                    operation['index'] = match.group(1)
-                elif op_type == 'execute':
-                    operation['sql'] = match.group(1)
+                for offset, field in enumerate(fields):
+                    operation[field] = match.group(first_group + offset)
                     
                 # Extract additional context
-                operation['context'] = self._extract_operation_context(content, match)
+                operation['context'] = self._extract_operation_context(lines, line_index)
                 
                 operations.append(operation)
                 
         return operations
         
-    def _extract_operation_context(self, content: str, match: re.Match) -> Dict[str, Any]:
-        """Extract additional context around an operation"""
+    def _extract_operation_context(self, lines: List[str], line_num: int) -> Dict[str, Any]:
+        """Extract additional context around an operation (line_num is 0-based)"""
         context = {}
         
         # Get surrounding lines
-        lines = content.split('\n')
-        line_num = content[:match.start()].count('\n')
-        
         start_line = max(0, line_num - 5)
         end_line = min(len(lines), line_num + 10)
         
@@ -138,12 +304,12 @@ class MigrationAnalyzer:
             context['unique'] = True
             
         # Check for default value
-        default_match = re.search(r'server_default=([^,\)]+)', context_text)
+        default_match = SERVER_DEFAULT_PATTERN.search(context_text)
         if default_match:
             context['default'] = default_match.group(1)
             
         # Check for type information
-        type_match = re.search(r'sa\.(\w+)(?:\([^)]*\))?', context_text)
+        type_match = COLUMN_TYPE_PATTERN.search(context_text)
         if type_match:
             context['column_type'] = type_match.group(1)
             
@@ -201,9 +367,7 @@ class MigrationAnalyzer:
             analysis['estimated_time'] = 5
             
         elif op_type == 'EXECUTE':
-            sql = operation.get('sql', '').upper()
-            
-            if any(danger in sql for danger in ['DROP', 'DELETE', 'TRUNCATE']):
+            if DANGEROUS_SQL_PATTERN.search(operation.get('sql', '')):
                 analysis['risk'] = 'HIGH'
                 analysis['warnings'].append('Raw SQL contains dangerous operations')
                 
@@ -217,17 +381,7 @@ class MigrationAnalyzer:
         
     def _estimate_row_count(self, table_name: str) -> int:
         """Estimate row count for a table"""
-        # In a real implementation, this would query the database
-        # For now, return a mock estimate
-        estimates = {
-            'users': 10000,
-            'files': 50000,
-            'conversations': 25000,
-            'agents': 100,
-            'sessions': 100000
-        }
-        
-        return estimates.get(table_name, 1000)
+        return ROW_ESTIMATES.get(table_name, 1000)
         
     def check_migration_compatibility(self, migration_path: Path) -> Dict[str, Any]:
         """Check migration compatibility with different database versions"""
@@ -259,27 +413,35 @@ class MigrationAnalyzer:
         """Suggest optimizations for migration operations"""
         suggestions = []
         
-        # Check for missing indexes on foreign keys
+        # One pass: missing indexes on foreign keys, and operations per table
+        table_op_counts = Counter()
         for op in operations:
             if op['type'] == 'ADD_COLUMN' and op.get('context', {}).get('foreign_key'):
                 suggestions.append(
                     f"Consider adding index on foreign key column {op['column']}"
                 )
-                
-        # Check for multiple operations on same table
-        table_ops = {}
-        for op in operations:
             if 'table' in op:
-                table = op['table']
-                if table not in table_ops:
-                    table_ops[table] = []
-                table_ops[table].append(op)
+                table_op_counts[op['table']] += 1
                 
-        for table, ops in table_ops.items():
-            if len(ops) > 3:
+        # Check for multiple operations on same table
+        for table, count in table_op_counts.items():
+            if count > 3:
                 suggestions.append(
                     f"Multiple operations on table '{table}'. "
                     "Consider combining for better performance"
                 )
                 
-        return suggestions
\ No newline at end of file
+        return suggestions
+
+
+# Each worker process builds its MigrationAnalyzer once and reuses it for every file it receives
+_worker_analyzer: Optional[MigrationAnalyzer] = None
+
+
+def _init_worker(config: Dict[str, Any]):
+    global _worker_analyzer
+    _worker_analyzer = MigrationAnalyzer(config)
+
+
+def _analyze_in_worker(path: Path) -> Dict[str, Any]:
+    return _worker_analyzer.analyze_migration(path)
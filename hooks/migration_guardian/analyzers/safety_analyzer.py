@@ -6,11 +6,55 @@ Analyzes changes and migrations for safety risks and data loss potential
 import re
 import subprocess
 from pathlib import Path
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Dict, List, Optional, Any, Set
 
 from ..utils.logger import logger
 
 
+# In a real implementation, this would query the database
+# For now, use mock data (read-only, shared by every analyzer)
+TABLE_STATS = MappingProxyType({
+    'users': MappingProxyType({'rows': 10000, 'size_mb': 50}),
+    'files': MappingProxyType({'rows': 50000, 'size_mb': 500}),
+    'conversations': MappingProxyType({'rows': 25000, 'size_mb': 200}),
+    'agents': MappingProxyType({'rows': 100, 'size_mb': 1}),
+    'sessions': MappingProxyType({'rows': 100000, 'size_mb': 300})
+})
+
+# (old base type, new base type) pairs that can lose data
+LOSSY_CONVERSIONS = frozenset({
+    ('VARCHAR', 'INTEGER'),
+    ('TEXT', 'VARCHAR'),
+    ('BIGINT', 'INTEGER'),
+    ('NUMERIC', 'INTEGER'),
+    ('TIMESTAMP', 'DATE'),
+    ('DOUBLE', 'FLOAT')
+})
+
+# Risk levels from lowest to highest, and each level's rank
+RISK_LEVELS = ('LOW', 'MEDIUM', 'HIGH')
+RISK_RANK = {level: rank for rank, level in enumerate(RISK_LEVELS)}
+
+# Rollback statement per reversible (or explicitly irreversible) change type
+ROLLBACK_TEMPLATES = {
+    'CREATE_TABLE': "DROP TABLE IF EXISTS {table};",
+    'DROP_TABLE': "-- Cannot rollback DROP TABLE without backup",
+    'ADD_COLUMN': "ALTER TABLE {table} DROP COLUMN IF EXISTS {column};",
+    'DROP_COLUMN': "-- Cannot rollback DROP COLUMN without backup"
+}
+
+
+@lru_cache(maxsize=256)
+def _is_lossy_conversion(old_type: str, new_type: str) -> bool:
+    """Check if type conversion could lose data (cached: type strings repeat across changes)"""
+    old_base = old_type.upper().partition('(')[0]
+    new_base = new_type.upper().partition('(')[0]
+    
+    return (old_base, new_base) in LOSSY_CONVERSIONS
+
+
 class SafetyAnalyzer:
     """Analyzes safety risks in database changes"""
     
@@ -48,56 +92,68 @@ class SafetyAnalyzer:
         if not changes or not changes.get('changes'):
             return report
             
-        # Analyze each change
+        # Analyze each change; data impact and downtime are accumulated in the same pass
+        risks = report['risks']
+        warnings = report['warnings']
+        recommendations = report['recommendations']
+        data_impact = report['data_impact']
+        risk_rank = 0
+        downtime = 0
         for change in changes['changes']:
             risk_analysis = self._analyze_change_risk(change)
             
-            # Update overall risk level
-            report['risk_level'] = self._max_risk_level(
-                report['risk_level'], risk_analysis['risk_level']
-            )
+            # Update overall risk level (ranked as an int, named once at the end)
+            change_rank = RISK_RANK[risk_analysis['risk_level']]
+            if change_rank > risk_rank:
+                risk_rank = change_rank
             
             # Collect risks and warnings
-            if risk_analysis['risk_level'] != 'LOW':
-                report['risks'].append(risk_analysis)
+            if change_rank:
+                risks.append(risk_analysis)
                 
-            report['warnings'].extend(risk_analysis.get('warnings', []))
-            report['recommendations'].extend(risk_analysis.get('recommendations', []))
+            warnings += risk_analysis['warnings']
+            recommendations += risk_analysis['recommendations']
             
             # Track data impact
+            row_count = 0
             if 'table' in change:
-                table = change['table']
-                report['data_impact'][table] = self._estimate_data_impact(change)
+                impact = self._estimate_data_impact(change)
+                data_impact[change['table']] = impact
+                row_count = impact['row_count']
+            
+            downtime += self._estimate_change_downtime(change['type'], row_count)
+            
+        report['risk_level'] = RISK_LEVELS[risk_rank]
                 
         # Check cross-module risks
         if dependencies.get('cross_module'):
-            report['warnings'].append(
+            warnings.append(
                 'Cross-module dependencies detected. Ensure proper migration order.'
             )
-            report['recommendations'].append(
+            recommendations.append(
                 f"Apply migrations in order: {' → '.join(dependencies['migration_order'])}"
             )
             
         # Calculate backup and staging requirements
         total_affected_rows = sum(
             impact.get('row_count', 0) 
-            for impact in report['data_impact'].values()
+            for impact in data_impact.values()
         )
         
         if total_affected_rows > self.safety_thresholds['require_backup_above_rows']:
             report['requires_backup'] = True
-            report['recommendations'].append(
+            recommendations.append(
                 f"Backup recommended: {total_affected_rows:,} rows affected"
             )
             
         if total_affected_rows > self.safety_thresholds['require_staged_migration_above']:
             report['requires_staging'] = True
-            report['recommendations'].append(
+            recommendations.append(
                 "Consider staged migration due to large data volume"
             )
             
-        # Estimate downtime
-        report['estimated_downtime'] = self._estimate_downtime(changes, report)
+        # Estimated downtime in seconds
+        report['estimated_downtime'] = int(downtime)
         
         return report
         
@@ -149,7 +205,7 @@ class SafetyAnalyzer:
             )
             
             # Check for lossy conversions
-            if self._is_lossy_conversion(change['old_type'], change['new_type']):
+            if _is_lossy_conversion(change['old_type'], change['new_type']):
                 risk['risk_level'] = 'HIGH'
                 risk['warnings'].append('Type conversion may result in data loss')
                 
@@ -166,22 +222,6 @@ class SafetyAnalyzer:
                 
         return risk
         
-    def _is_lossy_conversion(self, old_type: str, new_type: str) -> bool:
-        """Check if type conversion could lose data"""
-        lossy_conversions = {
-            ('VARCHAR', 'INTEGER'): True,
-            ('TEXT', 'VARCHAR'): True,
-            ('BIGINT', 'INTEGER'): True,
-            ('NUMERIC', 'INTEGER'): True,
-            ('TIMESTAMP', 'DATE'): True,
-            ('DOUBLE', 'FLOAT'): True
-        }
-        
-        old_base = old_type.upper().split('(')[0]
-        new_base = new_type.upper().split('(')[0]
-        
-        return lossy_conversions.get((old_base, new_base), False)
-        
     def _estimate_data_impact(self, change: Dict[str, Any]) -> Dict[str, Any]:
         """Estimate the data impact of a change"""
         impact = {
@@ -190,65 +230,33 @@ class SafetyAnalyzer:
             'has_data': False
         }
         
-        # In a real implementation, this would query the database
-        # For now, use mock data
-        table_stats = {
-            'users': {'rows': 10000, 'size_mb': 50},
-            'files': {'rows': 50000, 'size_mb': 500},
-            'conversations': {'rows': 25000, 'size_mb': 200},
-            'agents': {'rows': 100, 'size_mb': 1},
-            'sessions': {'rows': 100000, 'size_mb': 300}
-        }
-        
-        table = change.get('table', '')
-        if table in table_stats:
-            stats = table_stats[table]
+        stats = TABLE_STATS.get(change.get('table', ''))
+        if stats is not None:
             impact['row_count'] = stats['rows']
             impact['data_size'] = stats['size_mb']
             impact['has_data'] = stats['rows'] > 0
             
         return impact
         
-    def _estimate_downtime(self, changes: Dict[str, Any], 
-                          safety_report: Dict[str, Any]) -> int:
-        """Estimate migration downtime in seconds"""
-        downtime = 0
-        
-        for change in changes.get('changes', []):
-            change_type = change['type']
-            
-            # Base estimates
-            if change_type == 'CREATE_TABLE':
-                downtime += 1
-            elif change_type == 'DROP_TABLE':
-                downtime += 2
-            elif change_type == 'ADD_COLUMN':
-                # Depends on table size
-                table = change.get('table', '')
-                row_count = safety_report['data_impact'].get(table, {}).get('row_count', 0)
-                downtime += max(1, row_count / 10000)  # 1 second per 10k rows
-            elif change_type == 'DROP_COLUMN':
-                downtime += 5
-            elif change_type == 'ALTER_COLUMN_TYPE':
-                # Type changes can be slow
-                table = change.get('table', '')
-                row_count = safety_report['data_impact'].get(table, {}).get('row_count', 0)
-                downtime += max(5, row_count / 5000)  # 1 second per 5k rows
-            elif change_type == 'CREATE_INDEX':
-                # Index creation can be very slow
-                table = change.get('table', '')
-                row_count = safety_report['data_impact'].get(table, {}).get('row_count', 0)
-                downtime += max(10, row_count / 1000)  # 1 second per 1k rows
-                
-        return int(downtime)
-        
-    def _max_risk_level(self, level1: str, level2: str) -> str:
-        """Return the maximum risk level"""
-        levels = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2}
-        
-        if levels.get(level2, 0) > levels.get(level1, 0):
-            return level2
-        return level1
+    def _estimate_change_downtime(self, change_type: str, row_count: int) -> float:
+        """Estimate the downtime of one change in seconds, given its table's row count"""
+        # Base estimates
+        if change_type == 'CREATE_TABLE':
+            return 1
+        elif change_type == 'DROP_TABLE':
+            return 2
+        elif change_type == 'ADD_COLUMN':
+            # Depends on table size
+            return max(1, row_count / 10000)  # 1 second per 10k rows
+        elif change_type == 'DROP_COLUMN':
+            return 5
+        elif change_type == 'ALTER_COLUMN_TYPE':
+            # Type changes can be slow
+            return max(5, row_count / 5000)  # 1 second per 5k rows
+        elif change_type == 'CREATE_INDEX':
+            # Index creation can be very slow
+            return max(10, row_count / 1000)  # 1 second per 1k rows
+        return 0
         
     def generate_safety_checks(self, changes: Dict[str, Any]) -> List[str]:
         """Generate SQL safety checks for changes"""
@@ -288,25 +296,8 @@ class SafetyAnalyzer:
         rollback_statements = []
         
         for change in reversed(changes.get('changes', [])):
-            if change['type'] == 'CREATE_TABLE':
-                rollback_statements.append(
-                    f"DROP TABLE IF EXISTS {change['table']};"
-                )
-                
-            elif change['type'] == 'DROP_TABLE':
-                rollback_statements.append(
-                    f"-- Cannot rollback DROP TABLE without backup"
-                )
-                
-            elif change['type'] == 'ADD_COLUMN':
-                rollback_statements.append(
-                    f"ALTER TABLE {change['table']} "
-                    f"DROP COLUMN IF EXISTS {change['column']};"
-                )
-                
-            elif change['type'] == 'DROP_COLUMN':
-                rollback_statements.append(
-                    f"-- Cannot rollback DROP COLUMN without backup"
-                )
+            template = ROLLBACK_TEMPLATES.get(change['type'])
+            if template is not None:
+                rollback_statements.append(template.format_map(change))
                 
         return '\n'.join(rollback_statements)
\ No newline at end of file
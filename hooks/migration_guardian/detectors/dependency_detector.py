@@ -3,19 +3,57 @@ Dependency Detector
 Detects cross-module dependencies in SQLAlchemy models
 """
 
+import mmap
+import os
 import re
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Set, Optional, Any
+from typing import Dict, List, Set, Optional, Any, Tuple
 
 from ..utils.logger import logger
 
 
+# Patterns are compiled once at import and shared by every detector
+TABLENAME_PATTERN = re.compile(r'__tablename__\s*=\s*["\']([^"\']+)["\']')
+MODEL_CLASS_PATTERN = re.compile(r'class\s+(\w+)\s*\([^)]*Base[^)]*\):')
+FOREIGN_KEY_PATTERN = re.compile(r'ForeignKey\s*\(\s*["\']([^"\']+)["\']\s*\)')
+
+# Model files at least this big are scanned through a memory map with the bytes
+# twins of the patterns (no decoded copy); below it a plain read is faster
+MMAP_MIN_BYTES = 1024 * 1024
+BYTES_PATTERNS = {
+    pattern: re.compile(pattern.pattern.encode())
+    for pattern in (TABLENAME_PATTERN, MODEL_CLASS_PATTERN, FOREIGN_KEY_PATTERN)
+}
+
+
+def _find_all(pattern: re.Pattern, content) -> List[str]:
+    """pattern.findall over str content, or over a bytes buffer with the pattern's bytes twin"""
+    if isinstance(content, str):
+        return pattern.findall(content)
+    return [match.decode() for match in BYTES_PATTERNS[pattern].findall(content)]
+
+# CamelCase word boundaries: before a capitalized word, then between lower and upper
+CAMEL_WORD_PATTERN = re.compile('(.)([A-Z][a-z]+)')
+CAMEL_BOUNDARY_PATTERN = re.compile('([a-z0-9])([A-Z])')
+
+
 class DependencyDetector:
     """Detects dependencies between modules"""
     
+    # With cross_module_detection.threaded_scan enabled, _scan_modules reads model files
+    # on worker threads when there are at least this many
+    PARALLEL_MIN_FILES = 8
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.module_tables = self._scan_module_tables()
+        self.module_tables, self.module_foreign_keys = self._scan_modules()
+        
+        # Inverted index: table -> modules that define it, in scan order
+        self.table_modules: Dict[str, List[str]] = {}
+        for module, tables in self.module_tables.items():
+            for table in tables:
+                self.table_modules.setdefault(table, []).append(module)
         
     def analyze_dependencies(self, changes: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze dependencies for the given changes"""
@@ -54,55 +92,92 @@ class DependencyDetector:
         
         return dependencies
         
-    def _scan_module_tables(self) -> Dict[str, Dict[str, str]]:
-        """Scan all modules to map tables to modules"""
+    def _scan_modules(self) -> Tuple[Dict[str, Dict[str, str]], Dict[str, List[Dict[str, Any]]]]:
+        """Scan all modules once: tables mapped to their model file, and foreign keys, per module"""
         module_tables = {}
-        app_dir = Path("app")
-        
-        if not app_dir.exists():
-            return module_tables
-            
-        for module_dir in app_dir.iterdir():
-            if module_dir.is_dir() and (module_dir / "models").exists():
-                module_name = module_dir.name
-                module_tables[module_name] = {}
-                
-                # Scan model files
-                for model_file in (module_dir / "models").glob("*.py"):
-                    if model_file.name.startswith("__"):
-                        continue
-                        
-                    tables = self._extract_tables_from_file(model_file)
-                    for table in tables:
-                        module_tables[module_name][table] = model_file.name
-                        
-        return module_tables
+        module_foreign_keys = {}
         
-    def _extract_tables_from_file(self, file_path: Path) -> List[str]:
-        """Extract table names from a model file"""
-        tables = []
+        module_files = list(self._iter_model_files())
+        paths = [model_file for _, model_files in module_files for model_file in model_files]
         
-        try:
-            content = file_path.read_text()
+        # The regex work holds the GIL, so threads only help where reads block for long
+        # (network filesystems): serial unless enabled. Results merge here, in scan order.
+        threaded = self.config.get('cross_module_detection', {}).get('threaded_scan', False)
+        if not threaded or len(paths) < self.PARALLEL_MIN_FILES:
+            scans = map(self._scan_model_file, paths)
+        else:
+            from concurrent.futures import ThreadPoolExecutor
             
-            # Find __tablename__ definitions
-            table_pattern = r'__tablename__\s*=\s*["\']([^"\']+)["\']'
-            matches = re.findall(table_pattern, content)
-            tables.extend(matches)
-            
-            # Also try to infer from class names if no __tablename__
-            class_pattern = r'class\s+(\w+)\s*\([^)]*Base[^)]*\):'
-            class_matches = re.findall(class_pattern, content)
+            with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+                scans = list(pool.map(self._scan_model_file, paths))
+        scans = iter(scans)
+        
+        for module_name, model_files in module_files:
+            tables_by_name = module_tables[module_name] = {}
+            foreign_keys = module_foreign_keys[module_name] = []
             
-            for class_name in class_matches:
-                # Convert to table name (simple pluralization)
-                table_name = self._class_to_table_name(class_name)
-                if table_name not in tables:
-                    tables.append(table_name)
+            for model_file in model_files:
+                scanned = next(scans)
+                if scanned is None:
+                    continue
                     
+                tables, file_foreign_keys = scanned
+                for table in tables:
+                    tables_by_name[table] = model_file.name
+                foreign_keys.extend(file_foreign_keys)
+                
+        return module_tables, module_foreign_keys
+        
+    def _scan_model_file(self, model_file: Path) -> Optional[Tuple[List[str], List[Dict[str, Any]]]]:
+        """Read a model file once and extract both its tables and its foreign keys"""
+        try:
+            with open(model_file, 'rb') as f:
+                if os.fstat(f.fileno()).st_size >= MMAP_MIN_BYTES:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                        return self._extract_tables(content), self._extract_foreign_keys(content)
+                content = f.read().decode()
         except Exception as e:
-            logger.error(f"Error extracting tables from {file_path}: {e}")
+            logger.error(f"Error reading model file {model_file}: {e}")
+            return None
             
+        return self._extract_tables(content), self._extract_foreign_keys(content)
+        
+    def _iter_model_files(self):
+        """Yield (module name, model files) for every app/<module>/models directory"""
+        # os.scandir reuses the directory listing's type info instead of a stat per entry
+        try:
+            with os.scandir("app") as entries:
+                module_dirs = [entry for entry in entries if entry.is_dir()]
+        except FileNotFoundError:
+            return
+            
+        for module_dir in module_dirs:
+            models_dir = os.path.join(module_dir.path, "models")
+            if not os.path.isdir(models_dir):
+                continue
+                
+            with os.scandir(models_dir) as entries:
+                model_files = [
+                    Path(entry.path) for entry in entries
+                    if entry.name.endswith(".py") and not entry.name.startswith("__")
+                    and entry.is_file()
+                ]
+            yield module_dir.name, model_files
+        
+    def _extract_tables(self, content) -> List[str]:
+        """Extract table names from a model file's content (str, or a mapped bytes buffer)"""
+        # Find __tablename__ definitions
+        tables = _find_all(TABLENAME_PATTERN, content)
+        
+        # Also try to infer from class names if no __tablename__
+        class_matches = _find_all(MODEL_CLASS_PATTERN, content)
+        
+        for class_name in class_matches:
+            # Convert to table name (simple pluralization)
+            table_name = self._class_to_table_name(class_name)
+            if table_name not in tables:
+                tables.append(table_name)
+                
         return tables
         
     def _analyze_change_dependencies(self, change: Dict[str, Any], 
@@ -139,66 +214,66 @@ class DependencyDetector:
         if len(parts) >= 2:
             table_name = parts[-2]
             
-            # Find which module owns this table
-            for module, tables in self.module_tables.items():
-                if table_name in tables:
-                    if module != current_module:
-                        return {
-                            'from_module': current_module,
-                            'to_module': module,
-                            'type': 'foreign_key',
-                            'table': table_name,
-                            'reference': foreign_key
-                        }
-                        
+            # Find which other module owns this table
+            for module in self.table_modules.get(table_name, ()):
+                if module != current_module:
+                    return {
+                        'from_module': current_module,
+                        'to_module': module,
+                        'type': 'foreign_key',
+                        'table': table_name,
+                        'reference': foreign_key
+                    }
+                    
         return None
         
     def _build_dependency_graph(self, dependencies: List[Dict[str, Any]]) -> Dict[str, Set[str]]:
         """Build a dependency graph from the list of dependencies"""
-        graph = {}
+        graph = defaultdict(set)
         
         for dep in dependencies:
-            from_module = dep['from_module']
             to_module = dep['to_module']
-            
-            if from_module not in graph:
-                graph[from_module] = set()
-            graph[from_module].add(to_module)
+            graph[dep['from_module']].add(to_module)
             
             # Ensure all modules are in the graph
-            if to_module not in graph:
-                graph[to_module] = set()
+            graph[to_module]
                 
-        return graph
+        return dict(graph)
         
     def _calculate_migration_order(self, graph: Dict[str, Set[str]]) -> List[str]:
         """Calculate the order in which migrations should be applied"""
-        # Topological sort
+        # Topological sort: depth-first post-order with an explicit stack, so deep
+        # dependency chains can't hit the recursion limit
         visited = set()
         order = []
         
-        def visit(module: str):
-            if module in visited:
-                return
-            visited.add(module)
-            
-            # Visit dependencies first
-            for dep in graph.get(module, set()):
-                visit(dep)
-                
-            order.append(module)
-            
         # Visit all modules
-        for module in graph:
-            visit(module)
+        for root in graph:
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(graph.get(root, ())))]
             
+            while stack:
+                module, deps = stack[-1]
+                
+                # Visit dependencies first
+                for dep in deps:
+                    if dep not in visited:
+                        visited.add(dep)
+                        stack.append((dep, iter(graph.get(dep, ()))))
+                        break
+                else:
+                    stack.pop()
+                    order.append(module)
+                    
         return order
         
     def _class_to_table_name(self, class_name: str) -> str:
         """Convert class name to table name"""
         # Simple conversion: CamelCase to snake_case + plural
-        s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', class_name)
-        table_name = re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
+        s1 = CAMEL_WORD_PATTERN.sub(r'\1_\2', class_name)
+        table_name = CAMEL_BOUNDARY_PATTERN.sub(r'\1_\2', s1).lower()
         
         # Simple pluralization
         if not table_name.endswith('s'):
@@ -216,36 +291,26 @@ class DependencyDetector:
             'cross_dependencies': []
         }
         
-        # Scan all model files for foreign keys
-        app_dir = Path("app")
-        
-        for module_dir in app_dir.iterdir():
-            if module_dir.is_dir() and (module_dir / "models").exists():
-                module_name = module_dir.name
-                module_info = {
-                    'tables': list(self.module_tables.get(module_name, {}).keys()),
-                    'depends_on': set(),
-                    'depended_by': set()
-                }
-                
-                # Scan for foreign keys
-                for model_file in (module_dir / "models").glob("*.py"):
-                    if model_file.name.startswith("__"):
-                        continue
-                        
-                    foreign_keys = self._extract_foreign_keys_from_file(model_file)
-                    for fk in foreign_keys:
-                        dep_module = self._find_module_for_table(fk['table'])
-                        if dep_module and dep_module != module_name:
-                            module_info['depends_on'].add(dep_module)
-                            report['cross_dependencies'].append({
-                                'from': module_name,
-                                'to': dep_module,
-                                'type': 'foreign_key',
-                                'details': fk
-                            })
-                            
-                report['modules'][module_name] = module_info
+        # Foreign keys were collected by the module scan
+        for module_name, foreign_keys in self.module_foreign_keys.items():
+            module_info = {
+                'tables': list(self.module_tables.get(module_name, {}).keys()),
+                'depends_on': set(),
+                'depended_by': set()
+            }
+            
+            for fk in foreign_keys:
+                dep_module = self._find_module_for_table(fk['table'])
+                if dep_module and dep_module != module_name:
+                    module_info['depends_on'].add(dep_module)
+                    report['cross_dependencies'].append({
+                        'from': module_name,
+                        'to': dep_module,
+                        'type': 'foreign_key',
+                        'details': fk
+                    })
+                    
+            report['modules'][module_name] = module_info
                 
         # Update depended_by relationships
         for dep in report['cross_dependencies']:
@@ -254,34 +319,23 @@ class DependencyDetector:
                 
         return report
         
-    def _extract_foreign_keys_from_file(self, file_path: Path) -> List[Dict[str, Any]]:
-        """Extract foreign key definitions from a file"""
+    def _extract_foreign_keys(self, content) -> List[Dict[str, Any]]:
+        """Extract foreign key definitions from a model file's content (str, or a mapped bytes buffer)"""
         foreign_keys = []
         
-        try:
-            content = file_path.read_text()
-            
-            # Pattern for ForeignKey definitions
-            fk_pattern = r'ForeignKey\s*\(\s*["\']([^"\']+)["\']\s*\)'
-            matches = re.findall(fk_pattern, content)
-            
-            for match in matches:
-                parts = match.split('.')
-                if len(parts) >= 2:
-                    foreign_keys.append({
-                        'table': parts[-2],
-                        'column': parts[-1],
-                        'reference': match
-                    })
-                    
-        except Exception as e:
-            logger.error(f"Error extracting foreign keys from {file_path}: {e}")
-            
+        # Find ForeignKey definitions
+        for match in _find_all(FOREIGN_KEY_PATTERN, content):
+            parts = match.split('.')
+            if len(parts) >= 2:
+                foreign_keys.append({
+                    'table': parts[-2],
+                    'column': parts[-1],
+                    'reference': match
+                })
+                
         return foreign_keys
         
     def _find_module_for_table(self, table_name: str) -> Optional[str]:
         """Find which module owns a table"""
-        for module, tables in self.module_tables.items():
-            if table_name in tables:
-                return module
-        return None
\ No newline at end of file
+        modules = self.table_modules.get(table_name)
+        return modules[0] if modules else None
\ No newline at end of file
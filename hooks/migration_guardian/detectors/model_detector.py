@@ -7,13 +7,36 @@ import ast
 import difflib
 import hashlib
 import json
+import os
 import re
+import zlib
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Set, Optional, Any
+from typing import Dict, List, Set, Optional, Any, Tuple
 
 from ..utils.logger import logger
 
 
+# CamelCase word boundaries: before a capitalized word, then between lower and upper
+CAMEL_WORD_PATTERN = re.compile('(.)([A-Z][a-z]+)')
+CAMEL_BOUNDARY_PATTERN = re.compile('([a-z0-9])([A-Z])')
+
+
+def _content_digest(content: str) -> str:
+    """Fingerprint of a file's content, stored with its parsed models"""
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+EMPTY_CONTENT_DIGEST = _content_digest('')
+
+# Bump whenever the cached models change shape so stale cache files are ignored
+MODEL_CACHE_VERSION = 1
+MODEL_CACHE_TAG = f"models-v{MODEL_CACHE_VERSION}".encode()
+
+# AST nodes that can contain class definitions
+STATEMENT_NODES = (ast.stmt, ast.excepthandler, getattr(ast, 'match_case', ()))
+
+
 class ModelChangeDetector:
     """Detects changes in SQLAlchemy models"""
     
@@ -27,20 +50,41 @@ class ModelChangeDetector:
         try:
             # Read current file content
             current_content = Path(file_path).read_text()
+            current_digest = _content_digest(current_content)
             
-            # Get cached content
-            cached_content = self._get_cached_content(file_path)
-            
-            if not cached_content:
+            # Get the cached version, already parsed when possible
+            self._adopt_legacy_cache(file_path)
+            cached_digest = cached_models = None
+            cached = self._read_cache(file_path)
+            if cached is not None:
+                cached_digest, payload = cached
+                if cached_digest == current_digest and cached_digest != EMPTY_CONTENT_DIGEST:
+                    # Unchanged since the last run: nothing to migrate (or even to load)
+                    return {}
+                cached_models = self._load_cached_models(file_path, payload)
+                
+            if cached_models is None:
+                cached_content = self._get_cached_content(file_path)
+                if cached_content:
+                    cached_digest = _content_digest(cached_content)
+                    cached_models = self._parse_models(cached_content)
+                    
+            if cached_models is None or cached_digest == EMPTY_CONTENT_DIGEST:
                 # First time seeing this file
-                self._cache_content(file_path, current_content)
-                return self._analyze_new_file(current_content, module_name)
+                current_models = self._parse_models(current_content)
+                self._cache_content(file_path, current_content, current_digest, current_models)
+                return self._analyze_new_file(current_models, module_name)
+                
+            if cached_digest == current_digest:
+                # Unchanged since the last run: nothing to migrate
+                return {}
                 
             # Compare changes
-            changes = self._compare_models(cached_content, current_content, module_name)
+            current_models = self._parse_models(current_content)
+            changes = self._compare_models(cached_models, current_models, module_name)
             
             # Update cache
-            self._cache_content(file_path, current_content)
+            self._cache_content(file_path, current_content, current_digest, current_models)
             
             return changes
             
@@ -48,29 +92,94 @@ class ModelChangeDetector:
             logger.error(f"Error detecting changes in {file_path}: {e}")
             return {}
             
-    def _get_cached_content(self, file_path: str) -> Optional[str]:
-        """Get cached file content"""
+    def _read_cache(self, file_path: str) -> Optional[Tuple[str, bytes]]:
+        """Get the cached file's content digest (a plain header line) and its compressed models"""
         cache_file = self._get_cache_path(file_path)
-        if cache_file.exists():
-            return cache_file.read_text()
+        try:
+            data = cache_file.read_bytes()
+        except FileNotFoundError:
+            return None
+            
+        header, _, payload = data.partition(b'\n')
+        tag, _, digest = header.partition(b' ')
+        if tag != MODEL_CACHE_TAG:
+            # Written by another version of the detector: treat it as a cache miss
+            logger.debug(f"Ignoring model cache {cache_file} from another version")
+            return None
+        if len(digest) != len(EMPTY_CONTENT_DIGEST):
+            logger.warning(f"Ignoring unreadable model cache {cache_file}: bad header")
+            return None
+        return digest.decode('ascii', errors='replace'), payload
+        
+    def _load_cached_models(self, file_path: str, payload: bytes) -> Optional[List[Dict[str, Any]]]:
+        """Decompress the parsed models stored in a cache file"""
+        try:
+            return json.loads(zlib.decompress(payload))
+        except (zlib.error, ValueError) as e:
+            logger.warning(f"Ignoring unreadable model cache {self._get_cache_path(file_path)}: {e}")
+            return None
+            
+    def _get_cached_content(self, file_path: str) -> Optional[str]:
+        """Get cached raw file content (older caches, or models JSON can't hold)"""
+        content_file = self._get_cache_path(file_path).with_suffix('.cache')
+        if content_file.exists():
+            return content_file.read_text()
         return None
         
-    def _cache_content(self, file_path: str, content: str) -> None:
-        """Cache file content"""
+    def _cache_content(self, file_path: str, content: str, digest: str,
+                       models: List[Dict[str, Any]]) -> None:
+        """Cache a file's parsed models as compressed JSON behind a version and content digest header"""
         cache_file = self._get_cache_path(file_path)
+        content_file = cache_file.with_suffix('.cache')
         cache_file.parent.mkdir(parents=True, exist_ok=True)
-        cache_file.write_text(content)
+        
+        try:
+            cached = json.dumps(models, separators=(',', ':'))
+        except (TypeError, ValueError):
+            # Defaults that JSON can't hold (e.g. bytes): keep the raw content to re-parse instead
+            cache_file.unlink(missing_ok=True)
+            self._write_atomic(content_file, content.encode())
+            return
+            
+        header = MODEL_CACHE_TAG + b' ' + digest.encode() + b'\n'
+        self._write_atomic(cache_file, header + zlib.compress(cached.encode()))
+        content_file.unlink(missing_ok=True)
+        
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        """Write to a temporary file replaced into place, so a concurrent run never reads a partial cache"""
+        tmp_file = path.with_name(path.name + ".tmp")
+        try:
+            tmp_file.write_bytes(data)
+            os.replace(tmp_file, path)
+        except BaseException:
+            tmp_file.unlink(missing_ok=True)
+            raise
         
     def _get_cache_path(self, file_path: str) -> Path:
         """Get cache file path"""
         # Create unique cache filename
-        file_hash = hashlib.md5(file_path.encode()).hexdigest()[:8]
-        return self.cache_dir / f"{Path(file_path).name}_{file_hash}.cache"
+        file_hash = hashlib.blake2b(file_path.encode(), digest_size=4).hexdigest()
+        return self.cache_dir / f"{Path(file_path).name}_{file_hash}.models"
         
-    def _analyze_new_file(self, content: str, module_name: str) -> Dict[str, Any]:
-        """Analyze a new model file"""
-        models = self._parse_models(content)
+    def _adopt_legacy_cache(self, file_path: str) -> None:
+        """Rename a cache written under the old MD5-based name, so the file isn't seen as new"""
+        cache_file = self._get_cache_path(file_path)
+        content_file = cache_file.with_suffix('.cache')
+        if cache_file.exists() or content_file.exists():
+            return
+            
+        try:
+            file_md5 = hashlib.md5(file_path.encode(), usedforsecurity=False)
+        except TypeError:
+            # Python 3.8 has no usedforsecurity keyword
+            file_md5 = hashlib.md5(file_path.encode())
+        file_hash = file_md5.hexdigest()[:8]
+        legacy_file = self.cache_dir / f"{Path(file_path).name}_{file_hash}.cache"
+        if legacy_file.exists():
+            legacy_file.rename(content_file)
         
+    def _analyze_new_file(self, models: List[Dict[str, Any]], module_name: str) -> Dict[str, Any]:
+        """Analyze the parsed models of a new model file"""
         if not models:
             return {}
             
@@ -91,11 +200,9 @@ class ModelChangeDetector:
             
         return changes
         
-    def _compare_models(self, old_content: str, new_content: str, module_name: str) -> Dict[str, Any]:
-        """Compare old and new model versions"""
-        old_models = self._parse_models(old_content)
-        new_models = self._parse_models(new_content)
-        
+    def _compare_models(self, old_models: List[Dict[str, Any]], new_models: List[Dict[str, Any]],
+                        module_name: str) -> Dict[str, Any]:
+        """Compare old and new parsed model versions"""
         old_by_name = {m['class_name']: m for m in old_models}
         new_by_name = {m['class_name']: m for m in new_models}
         
@@ -124,11 +231,12 @@ class ModelChangeDetector:
                     'risk': 'HIGH'
                 })
                 
-        # Check for table changes
-        for name in set(old_by_name) & set(new_by_name):
-            old_model = old_by_name[name]
-            new_model = new_by_name[name]
-            
+        # Check for table changes (in model order)
+        for name, old_model in old_by_name.items():
+            new_model = new_by_name.get(name)
+            if new_model is None:
+                continue
+                
             # Compare fields
             field_changes = self._compare_fields(old_model, new_model)
             if field_changes:
@@ -147,7 +255,7 @@ class ModelChangeDetector:
             tree = ast.parse(content)
             models = []
             
-            for node in ast.walk(tree):
+            for node in self._walk_statements(tree):
                 if isinstance(node, ast.ClassDef):
                     # Check if it's a SQLAlchemy model
                     if self._is_sqlalchemy_model(node):
@@ -161,6 +269,17 @@ class ModelChangeDetector:
             logger.error(f"Error parsing models: {e}")
             return []
             
+    def _walk_statements(self, tree: ast.AST):
+        """Like ast.walk (same breadth-first order), but skipping expressions, which never hold classes"""
+        todo = deque([tree])
+        while todo:
+            node = todo.popleft()
+            todo.extend(
+                child for child in ast.iter_child_nodes(node)
+                if isinstance(child, STATEMENT_NODES)
+            )
+            yield node
+            
     def _is_sqlalchemy_model(self, node: ast.ClassDef) -> bool:
         """Check if class is a SQLAlchemy model"""
         # Check for Base inheritance
@@ -326,9 +445,12 @@ class ModelChangeDetector:
                     
                 changes.append(change)
                 
-        # Check for removed fields
-        for name, field in old_fields.items():
-            if name not in new_fields:
+        # Check for removed and modified fields in one pass over the old fields;
+        # modifications are reported after every removal, in field order
+        modifications = []
+        for name, old_field in old_fields.items():
+            new_field = new_fields.get(name)
+            if new_field is None:
                 changes.append({
                     'type': 'DROP_COLUMN',
                     'table': table_name,
@@ -336,15 +458,11 @@ class ModelChangeDetector:
                     'risk': 'HIGH',
                     'warning': 'Data will be permanently lost'
                 })
+                continue
                 
-        # Check for field modifications
-        for name in set(old_fields) & set(new_fields):
-            old_field = old_fields[name]
-            new_field = new_fields[name]
-            
             # Type change
             if old_field['type'] != new_field['type']:
-                changes.append({
+                modifications.append({
                     'type': 'ALTER_COLUMN_TYPE',
                     'table': table_name,
                     'column': name,
@@ -356,7 +474,7 @@ class ModelChangeDetector:
                 
             # Nullable change
             if old_field['nullable'] != new_field['nullable']:
-                changes.append({
+                modifications.append({
                     'type': 'ALTER_COLUMN_NULLABLE',
                     'table': table_name,
                     'column': name,
@@ -364,6 +482,7 @@ class ModelChangeDetector:
                     'risk': 'LOW' if new_field['nullable'] else 'MEDIUM'
                 })
                 
+        changes.extend(modifications)
         return changes
         
     def _compare_constraints(self, old_model: Dict, new_model: Dict) -> List[Dict[str, Any]]:
@@ -374,5 +493,5 @@ class ModelChangeDetector:
         
     def _camel_to_snake(self, name: str) -> str:
         """Convert CamelCase to snake_case"""
-        s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
-        return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
\ No newline at end of file
+        s1 = CAMEL_WORD_PATTERN.sub(r'\1_\2', name)
+        return CAMEL_BOUNDARY_PATTERN.sub(r'\1_\2', s1).lower()
\ No newline at end of file
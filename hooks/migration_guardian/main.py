@@ -13,6 +13,12 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Set, Tuple, Optional, Any
 
+# Optional: orjson parses the hook payload faster than the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .detectors.model_detector import ModelChangeDetector
 from .detectors.dependency_detector import DependencyDetector
 from .analyzers.migration_analyzer import MigrationAnalyzer
@@ -193,8 +199,9 @@ class MigrationGuardian:
 
 def main():
     """Hook entry point"""
-    # Read hook data from stdin
-    hook_data = json.loads(sys.stdin.read())
+    # Read hook data from stdin as bytes; both parsers accept them undecoded
+    raw = sys.stdin.buffer.read()
+    hook_data = orjson.loads(raw) if orjson is not None else json.loads(raw)
     
     # Run Migration Guardian
     guardian = MigrationGuardian()
@@ -53,7 +53,8 @@ DEFAULT_CONFIG = {
     "cross_module_detection": {
         "enabled": True,
         "warn_on_cross_dependencies": True,
-        "generate_dependency_graph": True
+        "generate_dependency_graph": True,
+        "threaded_scan": False
     },
     
     "auto_backup": {